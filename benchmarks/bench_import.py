@@ -0,0 +1,122 @@
+"""
+Startup benchmark: how long a fresh interpreter takes to import the MCP
+server, as every stdio session spawn does.
+
+Each module is imported in a new process, without GROQ_API_KEY, and the
+wall time of the import is reported (median/p95 over the iterations). One
+extra run with `python -X importtime` lists the slowest imports, and the
+check fails if any module that should load lazily (LangChain, the Groq
+client, requests, BeautifulSoup) was imported at startup.
+
+Usage:
+    python benchmarks/bench_import.py [--iterations 10] [--json results.json]
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["jobs_scraper", "laststartupScraping", "scrape_pipeline"]
+# Top-level packages that must only be imported on first use.
+LAZY_PACKAGES = ("langchain", "langchain_core", "langchain_groq", "groq", "requests", "bs4")
+
+_TIMED_IMPORT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+lazy = sorted({{name.split(".")[0] for name in sys.modules}} & set({lazy!r}))
+print(elapsed, ",".join(lazy))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop("GROQ_API_KEY", None)
+    env["SCRAPER_METRICS_LOG"] = "off"
+    return env
+
+
+def time_import(module):
+    """
+    Imports `module` in a fresh interpreter and returns (seconds, eagerly loaded lazy packages).
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMED_IMPORT.format(module=module, lazy=LAZY_PACKAGES)],
+        cwd=REPO_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    seconds, _, loaded = result.stdout.strip().rpartition("\n")[2].partition(" ")
+    return float(seconds), [name for name in loaded.split(",") if name]
+
+
+def slowest_imports(module, top=10):
+    """
+    Returns the `top` imports with the highest cumulative time, in ms, from `-X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def bench(iterations):
+    results = {}
+    for module in MODULES:
+        samples = []
+        eager = set()
+        for _ in range(iterations):
+            seconds, loaded = time_import(module)
+            samples.append(seconds)
+            eager.update(loaded)
+        results[module] = {
+            "median_ms": statistics.median(samples) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "eager_lazy_packages": sorted(eager),
+            "slowest": slowest_imports(module),
+        }
+    return results
+
+
+def print_report(results):
+    for module, result in results.items():
+        print(f"\n{module}: median {result['median_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms")
+        if result["eager_lazy_packages"]:
+            print(f"  ❌ imported at startup: {', '.join(result['eager_lazy_packages'])}")
+        for ms, name in result["slowest"]:
+            print(f"  {ms:>8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10, help="fresh interpreters per module")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = bench(args.iterations)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if any(result["eager_lazy_packages"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
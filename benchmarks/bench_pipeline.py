@@ -0,0 +1,267 @@
+"""
+Offline benchmark of the scraping pipeline.
+
+Serves the recorded careers pages in benchmarks/corpus/ from a local HTTP
+server, replaces the LLM with a deterministic stub that answers from
+corpus/manifest.json, and reports per-stage latency, throughput and peak
+memory for:
+
+    fetch     http_client.fetch_cached (disk cache disabled)
+    parse     ParsedPage
+    clean     clean_html_for_llm_no_spaces
+    learn     extract_consistent_selectors (stub LLM output)
+    extract   extract_jobs_with_precise_schema
+    pipeline  scrape_pipeline.scrape_jobs end to end, warm schema cache
+
+With --sweep N, it also scrapes N pages concurrently through
+scrape_pipeline.scrape_many (like a crawler sweep) and reports throughput
+and the worst event-loop stall, under the configured SCRAPER_OFFLOAD_MODE
+and SCRAPER_OFFLOAD_MIN_BYTES.
+
+Nothing touches the network or the real job_structure_cache.json.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--iterations 20] [--sweep 200] [--json results.json]
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Isolate every on-disk cache before the scraper modules read their settings.
+_TMP_DIR = tempfile.mkdtemp(prefix="scraper-bench-")
+os.environ["SCHEMA_CACHE_PATH"] = os.path.join(_TMP_DIR, "job_structure_cache.json")
+os.environ["COMPANY_DIRECTORY_PATH"] = os.path.join(_TMP_DIR, "company_directory_cache.json")
+os.environ["SCRAPER_JOB_STORE_PATH"] = os.path.join(_TMP_DIR, "jobs.db")
+os.environ["SCRAPER_HTTP_CACHE"] = "0"
+os.environ["SCRAPER_METRICS_LOG"] = "off"
+sys.path.insert(0, REPO_DIR)
+
+import http_client  # noqa: E402
+import offload  # noqa: E402
+import scrape_pipeline  # noqa: E402
+from laststartupScraping import LastStartupScraper  # noqa: E402
+from parsed_page import ParsedPage  # noqa: E402
+from schema_store import structure_cache  # noqa: E402
+
+STAGES = ["fetch", "parse", "clean", "learn", "extract", "pipeline"]
+
+
+def load_manifest():
+    with open(os.path.join(CORPUS_DIR, "manifest.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def install_stub_llm(manifest, base_url):
+    """
+    Replaces both LLM entry points with a stub that returns the recorded jobs
+    for the requested page, so learning is deterministic and free.
+    """
+    answers = {f"{base_url}/{entry['file']}": json.dumps(entry["jobs"]) for entry in manifest.values()}
+
+    def ask(cleaned_html, domain):
+        return answers[domain]
+
+    async def ask_async(cleaned_html, domain):
+        return answers[domain]
+
+    LastStartupScraper.ask_llm_for_content = staticmethod(ask)
+    LastStartupScraper.ask_llm_for_content_async = staticmethod(ask_async)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def start_server():
+    handler = functools.partial(QuietHandler, directory=CORPUS_DIR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+async def run_stages(url, jobs):
+    """
+    Runs every stage once and returns {stage: seconds}.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    response = await http_client.fetch_cached(url)
+    timings["fetch"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    page = ParsedPage(response.text, url)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    LastStartupScraper.clean_html_for_llm_no_spaces(page)
+    timings["clean"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    schema = LastStartupScraper.extract_consistent_selectors(page, jobs, url)
+    timings["learn"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extracted = LastStartupScraper.extract_jobs_with_precise_schema(page, schema) if schema else []
+    timings["extract"] = time.perf_counter() - start
+
+    # Each pipeline run must really parse and extract, not hit the job list cache.
+    scrape_pipeline._jobs_cache.clear()
+    start = time.perf_counter()
+    await scrape_pipeline.scrape_jobs(url)
+    timings["pipeline"] = time.perf_counter() - start
+
+    return timings, len(response.text), len(extracted)
+
+
+async def measure_peak_memory(url, jobs):
+    """
+    Runs every stage once under tracemalloc and returns {stage: peak bytes}.
+    Kept separate from the timing runs because tracing slows everything down.
+    """
+    peaks = {}
+
+    async def traced(stage, call):
+        tracemalloc.start()
+        try:
+            result = call()
+            if asyncio.iscoroutine(result):
+                result = await result
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+            return result
+        finally:
+            tracemalloc.stop()
+
+    response = await traced("fetch", lambda: http_client.fetch_cached(url))
+    page = await traced("parse", lambda: ParsedPage(response.text, url))
+    await traced("clean", lambda: LastStartupScraper.clean_html_for_llm_no_spaces(page))
+    schema = await traced("learn", lambda: LastStartupScraper.extract_consistent_selectors(page, jobs, url))
+    await traced("extract", lambda: LastStartupScraper.extract_jobs_with_precise_schema(page, schema) if schema else [])
+    scrape_pipeline._jobs_cache.clear()
+    await traced("pipeline", lambda: scrape_pipeline.scrape_jobs(url))
+    return peaks
+
+
+async def measure_sweep(urls, pages, max_concurrency=8):
+    """
+    Scrapes `pages` URLs (the corpus pages, repeated with distinct query
+    strings so the job list cache never answers) concurrently, while a
+    ticker measures how late the event loop wakes it up.
+    """
+    targets = [f"{urls[i % len(urls)]}?copy={i}" for i in range(pages)]
+    lags = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    failed = 0
+    start = time.perf_counter()
+    async for _, _, _, jobs, error in scrape_pipeline.scrape_many(targets, max_concurrency):
+        failed += error is not None
+    elapsed = time.perf_counter() - start
+    tick.cancel()
+    return {
+        "mode": offload.OFFLOAD_MODE,
+        "min_bytes": offload.OFFLOAD_MIN_BYTES,
+        "pages": pages,
+        "failed": failed,
+        "pages_per_s": pages / elapsed,
+        "max_loop_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def bench(iterations, sweep=0):
+    manifest = load_manifest()
+    server, base_url = start_server()
+    install_stub_llm(manifest, base_url)
+    results = {}
+    try:
+        for name, entry in manifest.items():
+            url = f"{base_url}/{entry['file']}"
+            samples = {stage: [] for stage in STAGES}
+            for _ in range(iterations):
+                timings, size, job_count = await run_stages(url, entry["jobs"])
+                for stage, seconds in timings.items():
+                    samples[stage].append(seconds)
+            peaks = await measure_peak_memory(url, entry["jobs"])
+            results[name] = {
+                "bytes": size,
+                "jobs_expected": len(entry["jobs"]),
+                "jobs_extracted": job_count,
+                "stages": {
+                    stage: {
+                        "median_ms": statistics.median(values) * 1000,
+                        "p95_ms": percentile(values, 0.95) * 1000,
+                        "pages_per_s": 1 / statistics.median(values) if statistics.median(values) else float("inf"),
+                        "mb_per_s": size / statistics.median(values) / 1e6 if statistics.median(values) else float("inf"),
+                        "peak_kb": peaks[stage] / 1024,
+                    }
+                    for stage, values in samples.items()
+                },
+            }
+            structure_cache.flush()
+        if sweep:
+            urls = [f"{base_url}/{entry['file']}" for entry in manifest.values()]
+            results["sweep"] = await measure_sweep(urls, sweep)
+    finally:
+        await http_client.aclose()
+        server.shutdown()
+    return results
+
+
+def print_report(results):
+    sweep = results.pop("sweep", None)
+    for name, result in results.items():
+        print(f"\n{name}: {result['bytes'] / 1024:.0f} KB, "
+              f"{result['jobs_extracted']}/{result['jobs_expected']} jobs extracted")
+        print(f"  {'stage':<10}{'median ms':>11}{'p95 ms':>10}{'pages/s':>10}{'MB/s':>9}{'peak KB':>10}")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<10}{stats['median_ms']:>11.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['pages_per_s']:>10.1f}{stats['mb_per_s']:>9.1f}{stats['peak_kb']:>10.0f}")
+    if sweep:
+        print(f"\nsweep ({sweep['mode']}, offload from {sweep['min_bytes']} chars): {sweep['pages']} pages, "
+              f"{sweep['failed']} failed, {sweep['pages_per_s']:.1f} pages/s, "
+              f"max event-loop stall {sweep['max_loop_lag_ms']:.1f} ms")
+        results["sweep"] = sweep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs per page")
+    parser.add_argument("--sweep", type=int, default=0, help="pages scraped concurrently in the sweep run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args.iterations, args.sweep))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
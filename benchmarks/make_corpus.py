@@ -0,0 +1,150 @@
+"""
+Regenerates the benchmark corpus in benchmarks/corpus/.
+
+Each page mimics the markup of one style of careers page found in
+job_structure_cache.json (Tailwind/Next.js, WordPress, Next.js CSS modules),
+including the inline scripts, SVG icons and navigation that make real pages
+heavy. manifest.json records the jobs on each page; the stub LLM in
+bench_pipeline.py answers with them.
+
+Usage:
+    python benchmarks/make_corpus.py [--jobs 60]
+"""
+import argparse
+import json
+import os
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+ROLES = [
+    "Backend Engineer", "Frontend Developer", "Data Scientist", "Product Manager",
+    "DevOps Engineer", "QA Automation Engineer", "Product Designer", "Sales Engineer",
+    "Customer Success Manager", "Security Researcher", "Mobile Developer", "Data Engineer",
+]
+LEVELS = ["", "Senior ", "Lead ", "Junior ", "Staff "]
+LOCATIONS = ["Tel Aviv", "Remote", "New York", "London", "Haifa"]
+
+SVG_ICON = (
+    '<svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">'
+    '<path d="M5 12h14M12 5l7 7-7 7" stroke="currentColor" stroke-width="2" stroke-linecap="round"/></svg>'
+)
+
+
+def make_jobs(count):
+    jobs = []
+    for i in range(count):
+        title = f"{LEVELS[i % len(LEVELS)]}{ROLES[i % len(ROLES)]}"
+        if i >= len(ROLES) * len(LEVELS) // 2:
+            title += f" {i}"
+        slug = title.lower().replace(" ", "-")
+        jobs.append({
+            "title": title,
+            "link": f"/careers/{slug}",
+            "location": LOCATIONS[(i // 3) % len(LOCATIONS)],
+            "department": ROLES[i % len(ROLES)].split()[-1],
+        })
+    return jobs
+
+
+def inline_state(jobs):
+    # Real Next.js pages inline their props; this is most of the page weight.
+    state = {"props": {"pageProps": {"positions": jobs * 4, "nav": ["About", "Careers", "Blog"] * 50}}}
+    return f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>'
+
+
+def tailwind_page(jobs):
+    cards = "".join(
+        '<li><a class="flex flex-col gap-2 rounded-lg border border-plum-16 p-4 hover:bg-plum-2 md:flex-row md:items-center md:p-8" '
+        f'href="{job["link"]}"><div class="text-h4 flex-1 text-plum">{job["title"]}</div>'
+        f'<div class="text-body-standard md:w-48 text-plum/60">{job["location"]}</div>{SVG_ICON}</a></li>'
+        for job in jobs
+    )
+    return f"""<!DOCTYPE html>
+<html class="flex min-h-full"><head><meta charset="utf-8"><title>Careers</title>
+<link rel="stylesheet" href="/_next/static/css/app.css"><script src="/_next/static/chunks/main.js"></script></head>
+<body class="flex min-h-full flex-1 bg-beige text-plum"><div id="__next">
+<div class="relative flex w-full max-w-[100vw] flex-1 flex-col">
+<nav class="sticky top-0 z-50 flex items-center justify-between px-4">{SVG_ICON * 6}<a href="/">Home</a><a href="/about">About</a><a href="/blog">Blog</a></nav>
+<div class="relative h-full min-h-screen"><main>
+<div class="relative pt-16 md:pt-24 pb-0 bg-white text-plum">
+<div class="relative mx-auto max-w-7xl px-4 lg:px-4">
+<h2 class="text-h2">Open positions</h2>
+<ul class="flex flex-col gap-2 md:gap-4">{cards}</ul>
+</div></div></main></div>
+<footer class="bg-plum text-white">{SVG_ICON * 10}<p>© Example Ltd.</p></footer>
+</div></div>{inline_state(jobs)}</body></html>
+"""
+
+
+def wordpress_page(jobs):
+    sections = []
+    for location in LOCATIONS:
+        items = "".join(
+            f'<li><a href="{job["link"]}"><div class="d-flex align-items-center justify-content-between fade-in">'
+            f'<span class="link-text">{job["title"]}</span><span class="icon">{SVG_ICON}</span></div></a></li>'
+            for job in jobs if job["location"] == location
+        )
+        if items:
+            sections.append(f'<h3>{location}</h3><ul>{items}</ul>')
+    return f"""<!DOCTYPE html>
+<html lang="en-US"><head><meta charset="UTF-8"><title>Careers - Example</title>
+<style>{".wp-block{{margin:0}}" * 400}</style><script>var wpData = {json.dumps({"nonce": "x" * 64, "i18n": LOCATIONS * 100})};</script></head>
+<body class="wp-singular page-template-default page page-id-17 wp-theme-wsc_upro">
+<div class="global-wrapper"><header class="site-header"><nav class="menu">{"<a href='/p'>Page</a>" * 30}</nav></header>
+<main class="content"><section class="block-hero"><h1>Join us</h1><p>We are hiring.</p></section>
+<section class="block-careers-list"><div class="container-fluid"><div class="list">{"".join(sections)}</div></div></section>
+</main><footer class="site-footer">{"<a href='/legal'>Legal</a>" * 20}</footer></div>
+<script>{"window.dataLayer=window.dataLayer||[];" * 200}</script></body></html>
+"""
+
+
+def nextjs_modules_page(jobs):
+    cards = "".join(
+        f'<div class="Careers_position_card__ZPrEP"><h3>{job["title"]}</h3>'
+        f'<div class="Careers_location__I9AUR">{job["location"]}</div>'
+        f'<div class="Careers_card_buttons__EfsF0"><a class="btn_outline" href="{job["link"]}">Apply</a></div></div>'
+        for job in jobs
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Careers</title></head>
+<body><div id="__next"><main>
+<section class="Careers_hero__a1B2c"><h1>Careers</h1>{SVG_ICON * 4}</section>
+<section class="Careers_positions_list__NClTM"><div><div class="Careers_position_cards__8gPwC">{cards}</div></div></section>
+</main></div>{inline_state(jobs)}</body></html>
+"""
+
+
+PAGES = {
+    "tailwind": tailwind_page,
+    "wordpress": wordpress_page,
+    "nextjs_modules": nextjs_modules_page,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=60, help="job postings per page")
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.jobs)
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    manifest = {}
+    for name, render in PAGES.items():
+        filename = f"{name}.html"
+        with open(os.path.join(CORPUS_DIR, filename), "w", encoding="utf-8") as f:
+            f.write(render(jobs))
+        page_jobs = jobs
+        if name == "wordpress":
+            # Grouped by location section on the page.
+            page_jobs = [job for location in LOCATIONS for job in jobs if job["location"] == location]
+        manifest[name] = {
+            "file": filename,
+            "jobs": [{key: job[key] for key in ("title", "link", "location")} for job in page_jobs],
+        }
+    with open(os.path.join(CORPUS_DIR, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(PAGES)} pages with {len(jobs)} jobs each to {CORPUS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from lxml import etree
+
+import http_client
+import metrics
+from schema_store import atomic_write_json
+from url_utils import is_ats_url, normalize_url, site_key
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_CACHE_PATH = os.getenv("SCRAPER_DISCOVERY_CACHE_PATH", "careers_discovery_cache.json")
+# Seconds a resolved careers URL is trusted; pages that were not found are retried sooner.
+DISCOVERY_TTL = float(os.getenv("SCRAPER_DISCOVERY_TTL", 7 * 24 * 3600))
+DISCOVERY_MISS_TTL = float(os.getenv("SCRAPER_DISCOVERY_MISS_TTL", 24 * 3600))
+# Per-request timeout for probes, robots.txt and sitemaps, in seconds.
+DISCOVERY_TIMEOUT = float(os.getenv("SCRAPER_DISCOVERY_TIMEOUT", 3))
+# Sitemap bytes read per company before giving up on finding a careers page in it.
+SITEMAP_MAX_BYTES = int(os.getenv("SCRAPER_SITEMAP_MAX_BYTES", 5_000_000))
+# Child sitemaps of a sitemap index that are followed.
+SITEMAP_MAX_CHILDREN = 5
+
+CAREERS_PATHS = ("/careers", "/jobs", "/join-us", "/careers/open-positions", "/company/careers", "/about/careers")
+CAREERS_SUBDOMAINS = ("careers", "jobs")
+
+# The last path segment of a careers listing page (not of a single posting).
+_CAREERS_PAGE = re.compile(r"/(careers?|jobs|join-us|join|work-with-us|open-positions|positions|vacancies)/?$", re.I)
+_CHILD_SITEMAP_HINT = re.compile(r"page|career|job", re.I)
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+class CareersDiscovery:
+    """
+    Finds a company's careers page instead of assuming `homepage/careers`.
+
+    For each site, HEAD probes of common careers paths and careers./jobs.
+    subdomains run with short timeouts while robots.txt and the sitemaps it
+    lists are scanned in the background (streamed and parsed incrementally,
+    so large sitemaps are never held in memory). A probe that redirects to
+    an applicant tracking system wins, then the first live probe in
+    CAREERS_PATHS order; the sitemap scan is cancelled as soon as a probe
+    answers and only waited for when none does.
+    Results, including misses, are cached per site with a TTL and persisted.
+    """
+
+    def __init__(self, path=DISCOVERY_CACHE_PATH, ttl=DISCOVERY_TTL, miss_ttl=DISCOVERY_MISS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._entries = None
+        self._inflight = {}
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning("Ignoring unreadable discovery cache %s: %s", self.path, e)
+        return self._entries
+
+    def _save(self):
+        try:
+            atomic_write_json(self.path, self._entries)
+        except OSError as e:
+            logger.warning("Failed to persist discovery cache: %s", e)
+
+    def cached(self, site_url: str):
+        """
+        Returns the cached entry {"url", "via", "checked_at"} for a site if it
+        is still within its TTL, else None.
+        """
+        entry = self._load().get(site_key(site_url))
+        if entry is None:
+            return None
+        ttl = self.ttl if entry["url"] else self.miss_ttl
+        return entry if time.time() - entry["checked_at"] < ttl else None
+
+    async def discover(self, site_url: str):
+        """
+        Returns the careers page URL of the site `site_url` belongs to, or
+        None if none was found. Concurrent calls for one site share a single
+        discovery. A page on an applicant tracking system is returned as is:
+        its host serves many companies, so probing it finds nothing of ours.
+        """
+        if is_ats_url(site_url):
+            return site_url
+        entry = self.cached(site_url)
+        if entry is not None:
+            metrics.incr("discovery.cache_hit")
+            return entry["url"]
+
+        key = site_key(site_url)
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._discover(site_url, key))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def resolve(self, careers_url: str) -> str:
+        """
+        Returns the discovered careers page for a guessed careers URL, or the
+        guess itself when discovery finds nothing.
+        """
+        return await self.discover(careers_url) or careers_url
+
+    async def _discover(self, site_url, key):
+        parts = urlsplit(site_url if "://" in site_url else f"https://{site_url}")
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with metrics.span("discovery", site=key) as span:
+            sitemaps = asyncio.ensure_future(self._from_sitemaps(origin))
+            try:
+                probes = await self._probe_all(origin)
+                sitemap_url = None if any(probes) else await sitemaps
+            finally:
+                sitemaps.cancel()
+            url, via = self._choose(probes, sitemap_url)
+            span["via"] = via
+        metrics.incr(f"discovery.{via}")
+        self._load()[key] = {"url": url, "via": via, "checked_at": time.time()}
+        self._save()
+        return url
+
+    @staticmethod
+    def _choose(probes, sitemap_url):
+        live = [url for url in probes if url is not None]
+        for url in live:
+            if is_ats_url(url):
+                return url, "ats"
+        if live:
+            return live[0], "probe"
+        if sitemap_url:
+            return sitemap_url, "sitemap"
+        return None, "miss"
+
+    def _probe_urls(self, origin):
+        parts = urlsplit(origin)
+        host = parts.hostname or ""
+        bare = host[4:] if host.startswith("www.") else host
+        urls = [f"{origin}{path}" for path in CAREERS_PATHS]
+        urls += [f"{parts.scheme}://{sub}.{bare}/" for sub in CAREERS_SUBDOMAINS]
+        return urls
+
+    async def _probe_all(self, origin):
+        return await asyncio.gather(*(self._probe(url, origin) for url in self._probe_urls(origin)))
+
+    async def _probe(self, url, origin):
+        """
+        Returns the final URL (after redirects) if `url` answers with a
+        success status, else None. Servers that reject HEAD get a streamed GET
+        that is closed right after the headers. A redirect to the site's home
+        page is a soft 404, not a careers page.
+        """
+        client = http_client.get_client()
+        try:
+            async with http_client.host_semaphore(url):
+                response = await client.head(url, timeout=DISCOVERY_TIMEOUT)
+                if response.status_code in (405, 501):
+                    async with client.stream("GET", url, timeout=DISCOVERY_TIMEOUT) as streamed:
+                        response = streamed
+        except httpx.HTTPError:
+            return None
+        if response.status_code >= 400:
+            return None
+        final = urlsplit(str(response.url))
+        if final.path in ("", "/") and normalize_url(str(response.url)) == normalize_url(origin):
+            return None
+        return str(response.url)
+
+    async def _sitemap_urls(self, origin):
+        """
+        Sitemaps declared in robots.txt, or the conventional locations.
+        """
+        client = http_client.get_client()
+        sitemaps = []
+        try:
+            async with http_client.host_semaphore(origin):
+                response = await client.get(f"{origin}/robots.txt", timeout=DISCOVERY_TIMEOUT)
+            if response.status_code < 400:
+                for line in response.text.splitlines():
+                    name, _, value = line.partition(":")
+                    if name.strip().lower() == "sitemap" and value.strip():
+                        sitemaps.append(urljoin(origin, value.strip()))
+        except httpx.HTTPError:
+            pass
+        return sitemaps or [f"{origin}/sitemap.xml"]
+
+    async def _from_sitemaps(self, origin):
+        budget = [SITEMAP_MAX_BYTES]
+        for sitemap in await self._sitemap_urls(origin):
+            found = await self._scan_sitemap(sitemap, budget, depth=0)
+            if found:
+                return found
+        return None
+
+    async def _scan_sitemap(self, url, budget, depth):
+        """
+        Streams one sitemap through an incremental XML parser, looking for a
+        careers listing page. Each <loc> is handled and freed as soon as it is
+        parsed. A sitemap index is followed one level down, preferring child
+        sitemaps whose names mention pages or jobs.
+
+        Args:
+            budget (list): Remaining bytes for this company, shared across sitemaps.
+        """
+        parser = etree.XMLPullParser(events=("end",), recover=True, resolve_entities=False, no_network=True)
+        gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if url.endswith(".gz") else None
+        children = []
+        best = None
+        client = http_client.get_client()
+        try:
+            async with http_client.host_semaphore(url):
+                async with client.stream("GET", url, timeout=DISCOVERY_TIMEOUT) as response:
+                    if response.status_code >= 400:
+                        return None
+                    async for chunk in response.aiter_bytes():
+                        budget[0] -= len(chunk)
+                        parser.feed(gunzip.decompress(chunk) if gunzip else chunk)
+                        for _, element in parser.read_events():
+                            if _local_name(element.tag) != "loc":
+                                continue
+                            loc = (element.text or "").strip()
+                            parent = element.getparent()
+                            if parent is not None and _local_name(parent.tag) == "sitemap":
+                                children.append(loc)
+                            elif _CAREERS_PAGE.search(urlsplit(loc).path):
+                                if best is None or len(loc) < len(best):
+                                    best = loc
+                            # Drop everything parsed so far; memory stays flat on huge sitemaps.
+                            entry = parent if parent is not None else element
+                            entry.clear()
+                            while entry.getprevious() is not None:
+                                del entry.getparent()[0]
+                        if best is not None and urlsplit(best).path.count("/") <= 2:
+                            break
+                        if budget[0] <= 0:
+                            metrics.incr("discovery.sitemap_truncated")
+                            break
+        except (httpx.HTTPError, etree.XMLSyntaxError, zlib.error):
+            return best
+
+        if best is None and depth == 0 and children:
+            children.sort(key=lambda child: _CHILD_SITEMAP_HINT.search(child) is None)
+            for child in children[:SITEMAP_MAX_CHILDREN]:
+                if budget[0] <= 0:
+                    break
+                best = await self._scan_sitemap(child, budget, depth + 1)
+                if best:
+                    break
+        return best
+
+
+careers_discovery = CareersDiscovery()
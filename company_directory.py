@@ -0,0 +1,215 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+
+import metrics
+from laststartupScraping import LastStartupScraper
+
+logger = logging.getLogger(__name__)
+
+COMPANY_DIRECTORY_PATH = os.getenv("COMPANY_DIRECTORY_PATH", "company_directory_cache.json")
+# Seconds before the funding page is fetched again in the background.
+COMPANY_DIRECTORY_TTL = float(os.getenv("COMPANY_DIRECTORY_TTL", 6 * 60 * 60))
+
+# Separator used in the flat substring index; cannot appear in a normalized name.
+_SEP = "\x00"
+
+
+def normalize_company_name(name: str) -> str:
+    """
+    Normalizes a company name for lookup: NFKC, casefolded, punctuation
+    replaced by spaces and whitespace collapsed. Hebrew letters are kept.
+    """
+    name = unicodedata.normalize("NFKC", name or "").casefold()
+    name = re.sub(r"[^\w\s]", " ", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+class CompanyDirectory:
+    """
+    Long-lived index of the companies listed on the LastStartup funding page.
+
+    The directory is fetched once, persisted to disk so a restart is warm, and
+    refreshed in the background once it is older than the TTL. Lookups are
+    served from memory (exact, then prefix, then substring match on the
+    normalized name).
+    """
+
+    def __init__(self, source_url, path=COMPANY_DIRECTORY_PATH, ttl=COMPANY_DIRECTORY_TTL):
+        self.source_url = source_url
+        self.path = path
+        self.ttl = ttl
+        self.fetched_at = 0.0
+        self._companies = []
+        self._exact = {}
+        self._names = []
+        self._sorted_names = []
+        self._flat = ""
+        self._offsets = []
+        self._refresh_task = None
+        self._load_from_disk()
+
+    def __len__(self):
+        return len(self._companies)
+
+    @property
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def _load_from_disk(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable company directory %s: %s", self.path, e)
+            return
+        if data.get("source_url") != self.source_url:
+            return
+        self._build_index(data.get("companies", []))
+        self.fetched_at = data.get("fetched_at", 0.0)
+
+    def _save_to_disk(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source_url": self.source_url,
+                "fetched_at": self.fetched_at,
+                "companies": self._companies,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _build_index(self, companies):
+        """
+        Builds the lookup structures. The first entry wins for duplicate names,
+        matching the order of the funding page.
+        """
+        exact = {}
+        kept = []
+        for company in companies:
+            key = normalize_company_name(company.get("company_name", ""))
+            if not key or key in exact:
+                continue
+            exact[key] = company
+            kept.append(company)
+
+        # Substring search runs over one flat string; offsets map a hit back to its name.
+        names = list(exact)
+        offsets = []
+        position = 0
+        for key in names:
+            offsets.append(position)
+            position += len(key) + len(_SEP)
+
+        self._companies = kept
+        self._exact = exact
+        self._sorted_names = sorted(names)
+        self._flat = _SEP.join(names)
+        self._offsets = offsets
+        self._names = names
+
+    def lookup(self, name):
+        """
+        Resolves a company name against the in-memory index.
+
+        Args:
+            name (str): The company name, or part of it.
+
+        Returns:
+            dict: The matching {'company_name', 'careers_url'} entry, or None.
+        """
+        key = normalize_company_name(name)
+        if not key or not self._companies:
+            return None
+
+        company = self._exact.get(key)
+        if company:
+            return company
+
+        i = bisect.bisect_left(self._sorted_names, key)
+        if i < len(self._sorted_names) and self._sorted_names[i].startswith(key):
+            return self._exact[self._sorted_names[i]]
+
+        hit = self._flat.find(key)
+        while hit != -1:
+            i = bisect.bisect_right(self._offsets, hit) - 1
+            candidate = self._names[i]
+            # Skip hits that straddle two names.
+            if hit + len(key) <= self._offsets[i] + len(candidate):
+                return self._exact[candidate]
+            hit = self._flat.find(key, hit + 1)
+        return None
+
+    async def refresh(self):
+        """
+        Re-fetches the funding page and swaps in a new index. An empty result
+        (e.g. the page failed to load) keeps the current index.
+        """
+        scraper = LastStartupScraper(self.source_url)
+        with metrics.span("company_directory.refresh", url=self.source_url) as span:
+            entries = await scraper.get_companies_async(self.source_url)
+            span["companies"] = len(entries)
+        companies = []
+        for entry in entries:
+            try:
+                data = json.loads(entry)
+            except json.JSONDecodeError:
+                continue
+            companies.append({
+                "company_name": data["company_name"].strip(),
+                "careers_url": data["careers_url"],
+            })
+
+        if not companies:
+            if not self._companies:
+                raise RuntimeError(f"No companies found on {self.source_url}")
+            logger.warning("Company directory refresh returned nothing; keeping %d cached entries", len(self))
+            return
+
+        self._build_index(companies)
+        self.fetched_at = time.time()
+        try:
+            self._save_to_disk()
+        except OSError as e:
+            logger.warning("Failed to persist company directory: %s", e)
+
+    def _refresh_in_background(self):
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self.refresh())
+        self._refresh_task.add_done_callback(self._log_refresh_failure)
+
+    @staticmethod
+    def _log_refresh_failure(task):
+        if not task.cancelled() and task.exception():
+            logger.warning("Background company directory refresh failed: %s", task.exception())
+
+    async def ensure_loaded(self):
+        """
+        Blocks on the first fetch only; a stale but populated directory is
+        served as-is while a refresh runs in the background.
+        """
+        if not self._companies:
+            # Concurrent first callers share a single fetch.
+            if not self._refresh_task or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh())
+            await asyncio.shield(self._refresh_task)
+        elif self.is_stale:
+            self._refresh_in_background()
+
+    async def find(self, name):
+        await self.ensure_loaded()
+        return self.lookup(name)
+
+    async def companies(self) -> list:
+        """
+        Returns every {'company_name', 'careers_url'} entry.
+        """
+        await self.ensure_loaded()
+        return list(self._companies)
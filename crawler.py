@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import time
+
+import metrics
+from careers_discovery import careers_discovery
+from job_store import job_store
+from scrape_pipeline import ScrapeError, company_directory, scrape_jobs
+
+logger = logging.getLogger(__name__)
+
+# Careers pages crawled at the same time.
+CRAWL_MAX_CONCURRENCY = int(os.getenv("SCRAPER_CRAWL_MAX_CONCURRENCY", 8))
+# Longest sleep between two checks for due pages, in seconds.
+CRAWL_POLL_INTERVAL = float(os.getenv("SCRAPER_CRAWL_POLL_INTERVAL", 60))
+# Pages taken per sweep; the rest stay due for the next one.
+CRAWL_BATCH_SIZE = int(os.getenv("SCRAPER_CRAWL_BATCH_SIZE", 200))
+
+
+async def crawl_page(page: dict) -> dict:
+    """
+    Scrapes one company's careers page and stores the differences since its
+    last crawl. The page is found by careers discovery; a site without one is
+    skipped without fetching the guessed URL.
+
+    The pipeline records valid scrapes in the store itself. A failed or
+    degraded scrape (see schema_validation) records nothing, so a broken
+    schema never shows up as every posting being removed. A page served from
+    the job list cache is unchanged.
+
+    Returns:
+        dict: {"new", "removed", "changed"} counts, or {"error": message}.
+        Never raises for a failing page.
+    """
+    report = {}
+    try:
+        url = await careers_discovery.discover(page["careers_url"])
+        if url is None:
+            job_store.reschedule(page["careers_url"], changed=False, failed=True)
+            return {"error": "no careers page found"}
+        await scrape_jobs(url, report, company=page.get("company"))
+    except Exception as e:
+        # A single bad page (e.g. a malformed host) must never end the sweep.
+        if not isinstance(e, ScrapeError):
+            logger.warning("Crawling %s failed: %s", page["careers_url"], e)
+        job_store.reschedule(page["careers_url"], changed=False, failed=True)
+        return {"error": str(e)}
+    if report.get("degraded"):
+        job_store.reschedule(page["careers_url"], changed=False, failed=True)
+        return {"error": "; ".join(report.get("problems", [])) or "degraded result"}
+
+    counts = report.get("changes", {"new": 0, "removed": 0, "changed": 0})
+    job_store.reschedule(page["careers_url"], changed=any(counts.values()))
+    for kind, count in counts.items():
+        metrics.incr(f"crawl.{kind}", count)
+    return counts
+
+
+async def crawl_once(max_concurrency: int = CRAWL_MAX_CONCURRENCY) -> dict:
+    """
+    Registers every company from the funding list, then crawls the pages
+    that are due.
+
+    Returns:
+        dict: Totals for the sweep: pages, failed, new, removed, changed.
+    """
+    try:
+        companies = await company_directory.companies()
+        job_store.add_pages((company["careers_url"], company["company_name"]) for company in companies)
+    except Exception as e:
+        logger.warning("Company directory unavailable, crawling known pages only: %s", e)
+
+    due = job_store.due_pages(limit=CRAWL_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(page):
+        async with semaphore:
+            return await crawl_page(page)
+
+    totals = {"pages": len(due), "failed": 0, "new": 0, "removed": 0, "changed": 0}
+    with metrics.span("crawl", pages=len(due)) as span:
+        for result in await asyncio.gather(*(run(page) for page in due), return_exceptions=True):
+            if isinstance(result, Exception) or "error" in result:
+                totals["failed"] += 1
+                continue
+            for kind, count in result.items():
+                totals[kind] += count
+        span.update(totals)
+    return totals
+
+
+async def run_crawler(max_concurrency: int = CRAWL_MAX_CONCURRENCY, once: bool = False):
+    """
+    Crawls due pages forever, sleeping until the next page is due (at most
+    CRAWL_POLL_INTERVAL, so newly listed companies are picked up).
+    """
+    while True:
+        totals = await crawl_once(max_concurrency)
+        logger.info("Crawl sweep: %s", totals)
+        if once:
+            return totals
+        next_due = job_store.next_due()
+        delay = CRAWL_POLL_INTERVAL if next_due is None else next_due - time.time()
+        await asyncio.sleep(min(max(delay, 1.0), CRAWL_POLL_INTERVAL))
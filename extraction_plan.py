@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+
+# Bump when css_to_xpath output changes, so stale compiled plans are not reused.
+PLAN_FORMAT_VERSION = 3
+PLAN_CACHE_SIZE = int(os.getenv("SCHEMA_PLAN_CACHE_SIZE", 256))
+
+# Classes that identify one page or one build rather than the site's layout.
+_PAGE_SPECIFIC_CLASS = re.compile(
+    r"^(?:page-id-\d+|postid-\d+|parent-pageid-\d+|page-template\S*|elementor-page-\d+|"
+    r"wp-singular|single-\S+|lang-\S+|locale-\S+)$"
+)
+# CSS-modules names end in a per-build hash: Careers_location__I9AUR.
+_CSS_MODULE_HASH = re.compile(r"^(\w+__)(?=[\w-]*[A-Z0-9])[\w-]{5}$")
+# Ids carrying a number are usually per-page (post-123, section-4).
+_NUMBERED_ID = re.compile(r"\d")
+
+
+def css_to_xpath(tailwind_selector: str) -> str:
+    """
+    Converts a selector in the structure-cache format ("tag.class1.class2 >
+    tag#id > ...") into an absolute XPath, matching classes with contains().
+    """
+    parts = tailwind_selector.split(" > ")
+    xpath_parts = []
+
+    for part in parts:
+        tag = "div"  # default if tag is missing
+        classes = []
+
+        # Handle ID selector
+        if "#" in part:
+            tag, id_part = part.split("#", 1)
+            id_xpath = f"{tag}[@id='{id_part}']"
+            xpath_parts.append(id_xpath)
+            continue
+
+        # Extract tag and classes (e.g., div.class1.class2)
+        match = re.match(r"(\w+)((?:\.\S+)+)?", part)
+        if match:
+            tag = match.group(1)
+            class_str = match.group(2)
+            if class_str:
+                class_names = class_str.strip(".").split(".")
+                class_conditions = " and ".join(
+                    [f"contains(@class, '{cls}')" for cls in class_names]
+                )
+                xpath_parts.append(f"{tag}[{class_conditions}]")
+            else:
+                xpath_parts.append(tag)
+        else:
+            xpath_parts.append(part)  # fallback
+
+    return "/" + "/".join(xpath_parts)
+
+
+def stable_step(step: str) -> str:
+    """
+    Drops the parts of one selector step that change between pages of the
+    same site: classes on <html>/<body> (page and locale markers), page-id
+    style classes, numbered ids and CSS-modules hashes (kept as a prefix,
+    which still matches because classes are compared with contains()).
+    """
+    if "#" in step:
+        tag, id_part = step.split("#", 1)
+        return tag if _NUMBERED_ID.search(id_part) else step
+    tag, *classes = step.split(".")
+    if tag in ("html", "body"):
+        return tag
+    kept = []
+    for cls in classes:
+        if _PAGE_SPECIFIC_CLASS.match(cls):
+            continue
+        module = _CSS_MODULE_HASH.match(cls)
+        kept.append(module.group(1) if module else cls)
+    return ".".join([tag, *kept])
+
+
+def stable_selector(selector: str) -> str:
+    return " > ".join(stable_step(step) for step in selector.split(" > "))
+
+
+def generalize_schema(schema: dict, tree) -> dict:
+    """
+    Rewrites a schema of absolute selectors into a site-wide form: a stable
+    `job_container` selector for the repeated job card, with the fields that
+    live inside the card relative to it ("." for the card itself). Fields
+    outside the card (e.g. a section heading naming the location) stay
+    absolute.
+
+    The card is the innermost common ancestor of the title and link
+    elements. Wider ancestors may match once per job only on the page the
+    schema is learned from (one job per office section), so they are not
+    used. A page with fewer than two cards says nothing about the layout and
+    its schema is left as is. The card's deepest ancestor below <body> that
+    is named by a stable id is saved as `job_region`: ids are unique on every
+    page of the site, not just this one, so it holds every card and a
+    streamed parse can stop once it is closed.
+    """
+    if "source" in schema or "job_container" in schema:
+        return schema
+    steps = {field: stable_selector(selector).split(" > ") for field, selector in schema.items()}
+    anchors = [steps[field] for field in ("title", "link") if field in steps]
+    if not anchors:
+        return schema
+
+    common = []
+    for parts in zip(*anchors):
+        if len(set(parts)) != 1:
+            break
+        common.append(parts[0])
+    if not common:
+        return schema
+
+    def count(parts):
+        return len(tree.xpath(css_to_xpath(" > ".join(parts))))
+
+    container = common
+    if count(container) < 2:
+        return schema
+
+    generalized = {"job_container": " > ".join(container)}
+    region = _id_region(container)
+    if region is not None:
+        generalized["job_region"] = region
+    for field, parts in steps.items():
+        if parts[:len(container)] == container:
+            generalized[field] = " > ".join(parts[len(container):]) or "."
+        else:
+            generalized[field] = " > ".join(parts)
+    return generalized
+
+
+def _id_region(steps):
+    """
+    The path to the deepest ancestor of a card (below <body>, excluding the
+    card itself) whose step carries an id, or None.
+    """
+    for end in range(len(steps) - 1, 2, -1):
+        if "#" in steps[end - 1]:
+            return " > ".join(steps[:end])
+    return None
+
+
+def schema_version(schema: dict) -> str:
+    """
+    Returns a stable version stamp for a schema: a hash of its content and
+    the plan format version.
+    """
+    payload = json.dumps(schema, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{PLAN_FORMAT_VERSION}:{payload}".encode("utf-8")).hexdigest()[:16]
+
+
+def _implicit_container(schema: dict):
+    """
+    The card selector for a schema saved without `job_container`: the
+    deepest path shared by the title and link selectors.
+    """
+    anchors = [stable_selector(schema[field]).split(" > ") for field in ("title", "link") if schema.get(field)]
+    if not anchors:
+        return None
+    common = []
+    for parts in zip(*anchors):
+        if len(set(parts)) != 1:
+            break
+        common.append(parts[0])
+    return " > ".join(common) or None
+
+
+def _relative_selector(selector: str, container: str):
+    """
+    `selector` relative to `container` ("." for the card itself), or None
+    if it does not point inside the card.
+    """
+    if selector == ".":
+        return "."
+    if not selector.startswith("html"):
+        return selector
+    steps, card = stable_selector(selector).split(" > "), container.split(" > ")
+    if steps[:len(card)] != card:
+        return None
+    return " > ".join(steps[len(card):]) or "."
+
+
+def _is_inside(element, card):
+    for ancestor in element.iterancestors():
+        if ancestor is card:
+            return True
+    return False
+
+
+def _wrappers(cards):
+    """
+    Maps each card to its widest ancestor that contains no other card (the
+    card itself if its parent already holds another one).
+    """
+    counts = {}
+    for card in cards:
+        for ancestor in card.iterancestors():
+            counts[ancestor] = counts.get(ancestor, 0) + 1
+    wrappers = {}
+    for card in cards:
+        wrapper = card
+        for ancestor in card.iterancestors():
+            if counts[ancestor] > 1:
+                break
+            wrapper = ancestor
+        wrappers[card] = wrapper
+    return wrappers
+
+
+class ExtractionPlan:
+    """
+    A schema compiled once into lxml XPath objects. Evaluating a plan does no
+    regex or string work; it only runs the precompiled expressions.
+
+    A schema's optional "source" key is not a selector: it names where jobs
+    come from when that is not the page markup (e.g. "json-ld"). With a
+    `job_container`, selectors not starting at "html" are relative to it.
+    An optional `job_region` is compiled to `region` (see generalize_schema)
+    and is not a field either.
+
+    Records are extracted per card (see iter_cards): the container is
+    matched once and every field is looked up inside its card, so a field
+    missing from one card cannot shift the others. A field outside the card
+    (e.g. a section heading naming the location) takes the match inside the
+    card's wrapper (its widest ancestor holding no other card) if there is
+    one, else the nearest match before the card in document order.
+    """
+
+    def __init__(self, schema: dict, version: str = None):
+        self.version = version or schema_version(schema)
+        self.schema = schema
+        self.source = schema.get("source")
+        container = schema.get("job_container")
+        container_xpath = css_to_xpath(stable_selector(container)) if container else None
+        self.sources = {}
+        for field, selector in schema.items():
+            if field in ("source", "job_region"):
+                continue
+            if field == "job_container" or container is None or selector.startswith("html"):
+                self.sources[field] = css_to_xpath(stable_selector(selector))
+            elif selector == ".":
+                self.sources[field] = container_xpath
+            else:
+                self.sources[field] = container_xpath + css_to_xpath(stable_selector(selector))
+        self.fields = {field: etree.XPath(source) for field, source in self.sources.items()}
+
+        card = stable_selector(container) if container else _implicit_container(schema)
+        self.container = etree.XPath(css_to_xpath(card)) if card and not self.source else None
+        # field -> XPath relative to the card (None for the card itself)
+        self.inside = {}
+        # field -> XPath matching the cards and the field, in document order
+        self.outside = {}
+        for field, selector in schema.items():
+            if field in ("source", "job_container", "job_region") or self.container is None:
+                continue
+            relative = _relative_selector(selector, card)
+            if relative == ".":
+                self.inside[field] = None
+            elif relative is not None:
+                self.inside[field] = etree.XPath("." + css_to_xpath(stable_selector(relative)))
+            else:
+                self.outside[field] = etree.XPath(f"{css_to_xpath(card)} | {css_to_xpath(stable_selector(selector))}")
+
+        region = schema.get("job_region")
+        # Regions saved before they had to be named by an id may repeat on
+        # later pages; stopping at the first one would drop jobs.
+        if region and "#" not in stable_selector(region).rsplit(" > ", 1)[-1]:
+            region = None
+        self.region = etree.XPath(css_to_xpath(stable_selector(region))) if region else None
+        self.region_tag = region.rsplit(" > ", 1)[-1].split(".")[0].split("#")[0] if region else None
+
+    def evaluate(self, tree):
+        return {field: xpath(tree) for field, xpath in self.fields.items()}
+
+    def iter_cards(self, tree):
+        """
+        Yields one {field: element or None} dict per job card, in document
+        order. Cards with neither a title nor a link are skipped.
+        """
+        cards = self.container(tree)
+        if not cards:
+            return
+        card_set = set(cards)
+        wrappers = _wrappers(cards) if self.outside else {}
+        # One ordered pass per outside field: remember the last heading seen
+        # before each card, unless the card or its wrapper holds a match.
+        outside = {field: {} for field in self.outside}
+        for field, xpath in self.outside.items():
+            values = outside[field]
+            last = card = None
+            for element in xpath(tree):
+                if element in card_set:
+                    card = element
+                    values[card] = last
+                elif card is not None and _is_inside(element, card):
+                    if values[card] is None or not _is_inside(values[card], card):
+                        values[card] = element
+                elif card is not None and _is_inside(element, wrappers[card]):
+                    # A sibling after the card, e.g. <a>Title</a><span>Location</span>.
+                    if values[card] is None or not _is_inside(values[card], wrappers[card]):
+                        values[card] = element
+                else:
+                    last = element
+
+        for card in cards:
+            record = {}
+            for field, xpath in self.inside.items():
+                if xpath is None:
+                    record[field] = card
+                else:
+                    matches = xpath(card)
+                    record[field] = matches[0] if matches else None
+            for field, values in outside.items():
+                record[field] = values.get(card)
+            if record.get("title") is None and record.get("link") is None:
+                continue
+            yield record
+
+
+_plans = OrderedDict()
+# Plans are compiled from offload worker threads too.
+_plans_lock = threading.Lock()
+
+
+def compile_schema(schema: dict, version: str = None) -> ExtractionPlan:
+    """
+    Returns the compiled plan for a schema, from an LRU keyed by version stamp.
+
+    Args:
+        schema (dict): field -> CSS selector, as stored in the structure cache.
+        version (str): The schema's version stamp, if the caller already has it.
+    """
+    version = version or schema_version(schema)
+    with _plans_lock:
+        plan = _plans.get(version)
+        if plan is not None:
+            _plans.move_to_end(version)
+            return plan
+    plan = ExtractionPlan(schema, version)
+    with _plans_lock:
+        _plans[version] = plan
+        if len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
@@ -0,0 +1,179 @@
+import asyncio
+import codecs
+import importlib.util
+import logging
+import os
+from urllib.parse import urlparse
+
+import httpx
+
+import metrics
+from response_cache import HTTP_CACHE_ENABLED, CachedResponse, response_cache
+
+logger = logging.getLogger(__name__)
+
+# Pool and timeout settings, tunable through the environment.
+HTTP_MAX_CONNECTIONS = int(os.getenv("SCRAPER_HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("SCRAPER_HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPER_HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_PER_HOST_LIMIT = int(os.getenv("SCRAPER_HTTP_PER_HOST", 4))
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("SCRAPER_HTTP_CONNECT_TIMEOUT", 5))
+# Largest (decompressed) page body read, in bytes; the rest is dropped. 0 means no limit.
+HTTP_MAX_BYTES = int(os.getenv("SCRAPER_HTTP_MAX_BYTES", 5_000_000))
+# HTTP/2 needs the optional `h2` package (httpx[http2]).
+HTTP2 = os.getenv("SCRAPER_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_client = None
+_client_loop = None
+_host_semaphores = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide AsyncClient, creating it on first use.
+
+    The client is tied to the running event loop; if the loop changes (e.g.
+    separate asyncio.run() calls in scripts) a fresh client is created.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client_loop = loop
+        _host_semaphores.clear()
+    return _client
+
+
+def host_semaphore(url: str) -> asyncio.Semaphore:
+    """
+    Returns the semaphore limiting concurrent requests to the host of `url`.
+    """
+    host = urlparse(url).netloc.lower()
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = _host_semaphores[host] = asyncio.Semaphore(HTTP_PER_HOST_LIMIT)
+    return semaphore
+
+
+async def fetch(url: str, **kwargs) -> httpx.Response:
+    """
+    GETs a URL through the shared client, respecting the per-host limit.
+
+    Raises:
+        httpx.HTTPError: On transport errors or a non-2xx status.
+    """
+    client = get_client()
+    async with host_semaphore(url):
+        response = await client.get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+async def _read_text(response: httpx.Response, max_bytes: int, on_text):
+    """
+    Streams and decodes a response body chunk by chunk, stopping at
+    `max_bytes` or when `on_text(chunk)` returns True.
+
+    Returns:
+        tuple: (text, complete, truncated) where `complete` is False if
+        `on_text` stopped the reading and `truncated` is True if the body was
+        cut at `max_bytes`.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    read = 0
+    async for chunk in response.aiter_bytes():
+        capped = bool(max_bytes) and read + len(chunk) > max_bytes
+        if capped:
+            chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        text = decoder.decode(chunk)
+        parts.append(text)
+        if on_text is not None and text and on_text(text):
+            metrics.incr("http.stopped_early")
+            return "".join(parts), False, False
+        if capped:
+            metrics.incr("http.truncated")
+            logger.warning("Body of %s truncated at %d bytes", response.url, max_bytes)
+            return "".join(parts), False, True
+    tail = decoder.decode(b"", final=True)
+    if tail and on_text is not None:
+        on_text(tail)
+    parts.append(tail)
+    return "".join(parts), True, False
+
+
+async def fetch_cached(url: str, max_bytes: int = HTTP_MAX_BYTES, on_text=None) -> CachedResponse:
+    """
+    GETs a page through the on-disk response cache.
+
+    A fresh entry is returned without touching the network. A stale one is
+    revalidated with If-None-Match / If-Modified-Since, and a 304 reuses the
+    cached body. Check `.from_cache` and `.hash` on the result to skip work on
+    unchanged pages.
+
+    A downloaded body is streamed and decoded incrementally. Each decoded
+    chunk is passed to `on_text` as it arrives (e.g. IncrementalParse.feed);
+    when it returns True the download stops there. Such a partial body
+    (`.complete` is False) is cached with its validators and served again
+    only to callers that pass `on_text`; callers that need the whole page
+    download it. A body larger than `max_bytes` is cut there
+    (`.truncated` is True) and never cached.
+
+    Raises:
+        httpx.HTTPError: On transport errors or a non-2xx, non-304 status.
+    """
+    cached = response_cache.get(url) if HTTP_CACHE_ENABLED else None
+    if cached is not None and not cached.complete and on_text is None:
+        cached = None
+    if cached is not None and cached.is_fresh(response_cache.ttl):
+        metrics.incr("http_cache.fresh")
+        return cached
+
+    client = get_client()
+    headers = cached.conditional_headers() if cached is not None else {}
+    async with host_semaphore(url):
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                metrics.incr("http_cache.revalidated")
+                response_cache.touch(cached)
+                return cached
+            metrics.incr("http_cache.downloaded")
+            response.raise_for_status()
+            text, complete, truncated = await _read_text(response, max_bytes, on_text)
+
+    result = CachedResponse(
+        url,
+        text,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        complete=complete,
+        truncated=truncated,
+        final_url=str(response.url),
+    )
+    if HTTP_CACHE_ENABLED and not truncated:
+        response_cache.put(result)
+    return result
+
+
+async def aclose():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from url_utils import canonical_link, normalize_url
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_PATH = os.getenv("SCRAPER_JOB_STORE_PATH", "jobs.db")
+# Adaptive crawl interval bounds per careers page, in seconds.
+CRAWL_MIN_INTERVAL = float(os.getenv("SCRAPER_CRAWL_MIN_INTERVAL", 3600))
+CRAWL_MAX_INTERVAL = float(os.getenv("SCRAPER_CRAWL_MAX_INTERVAL", 7 * 24 * 3600))
+CRAWL_INITIAL_INTERVAL = float(os.getenv("SCRAPER_CRAWL_INITIAL_INTERVAL", 6 * 3600))
+
+POSTING_FIELDS = ("title", "location", "department")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    link TEXT PRIMARY KEY,
+    careers_url TEXT NOT NULL,
+    company TEXT,
+    title TEXT,
+    location TEXT,
+    department TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    removed_at REAL
+);
+CREATE INDEX IF NOT EXISTS postings_by_page ON postings (careers_url, removed_at);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    link TEXT NOT NULL,
+    careers_url TEXT NOT NULL,
+    company TEXT,
+    title TEXT,
+    location TEXT,
+    department TEXT,
+    changes TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_time ON events (at);
+
+CREATE TABLE IF NOT EXISTS pages (
+    careers_url TEXT PRIMARY KEY,
+    company TEXT,
+    interval_s REAL NOT NULL,
+    next_due REAL NOT NULL,
+    last_crawled REAL,
+    last_changed REAL,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pages_by_due ON pages (next_due);
+"""
+
+# Full-text index over the postings table, kept in sync by triggers so every
+# recorded scrape updates it incrementally.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS postings_fts USING fts5(
+    title, location, department, company,
+    content='postings', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS postings_fts_insert AFTER INSERT ON postings BEGIN
+    INSERT INTO postings_fts (rowid, title, location, department, company)
+    VALUES (new.rowid, new.title, new.location, new.department, new.company);
+END;
+CREATE TRIGGER IF NOT EXISTS postings_fts_delete AFTER DELETE ON postings BEGIN
+    INSERT INTO postings_fts (postings_fts, rowid, title, location, department, company)
+    VALUES ('delete', old.rowid, old.title, old.location, old.department, old.company);
+END;
+CREATE TRIGGER IF NOT EXISTS postings_fts_update AFTER UPDATE OF title, location, department, company ON postings BEGIN
+    INSERT INTO postings_fts (postings_fts, rowid, title, location, department, company)
+    VALUES ('delete', old.rowid, old.title, old.location, old.department, old.company);
+    INSERT INTO postings_fts (rowid, title, location, department, company)
+    VALUES (new.rowid, new.title, new.location, new.department, new.company);
+END;
+"""
+# bm25 column weights: title, location, department, company.
+FTS_WEIGHTS = (10.0, 2.0, 2.0, 4.0)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def posting_keys(base_url: str, jobs) -> dict:
+    """
+    Keys a page's scraped postings by canonical job link; a link listed
+    twice is one posting. Postings without a link of their own are keyed by
+    page, title and location, and numbered when several share them.
+
+    Args:
+        base_url (str): The URL the page was served from; relative links
+            are resolved against it.
+    """
+    page = canonical_link(base_url, "")
+    keyed = {}
+    for job in jobs:
+        link = canonical_link(base_url, job.link or "")
+        if link != page:
+            keyed.setdefault(link, job)
+            continue
+        key = f"{page}#{job.title.strip().lower()}|{(job.location or '').strip().lower()}"
+        unique, count = key, 1
+        while unique in keyed:
+            count += 1
+            unique = f"{key}|{count}"
+        keyed[unique] = job
+    return keyed
+
+
+def _rekey(link: str, location: str) -> str:
+    """
+    The current key of a posting stored under an older key format.
+    """
+    page, linkless, title = link.partition("#")
+    page = canonical_link(page, "")
+    if not linkless:
+        return page
+    if "|" not in title:
+        title = f"{title}|{(location or '').strip().lower()}"
+    return f"{page}#{title}"
+
+
+class JobStore:
+    """
+    Local SQLite store of the postings seen on each careers page.
+
+    Only differences are written: a scrape inserts "new" events for unseen
+    links, "removed" events for links that disappeared and "changed" events
+    for postings whose title, location or department changed. It also keeps
+    each page's adaptive crawl schedule and, where SQLite has FTS5, a
+    full-text index of the postings (LIKE matching otherwise).
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        self.has_fts = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.create_function("normalize_url", 1, normalize_url, deterministic=True)
+            conn.create_function("rekey", 2, _rekey, deterministic=True)
+            with conn:
+                # Postings are grouped by normalized page; rows stored under a raw URL are moved over.
+                conn.execute("UPDATE postings SET careers_url = normalize_url(careers_url)"
+                             " WHERE careers_url != normalize_url(careers_url)")
+                # Likewise for postings keyed before links dropped "www." and
+                # linkless postings were keyed by location too.
+                conn.execute("UPDATE OR IGNORE postings SET link = rekey(link, location)"
+                             " WHERE link != rekey(link, location)")
+            self.has_fts = self._create_fts(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _create_fts(conn):
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'postings_fts'"
+        ).fetchone() is not None
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.info("SQLite FTS5 unavailable (%s); job search falls back to LIKE", e)
+            return False
+        if not existed:
+            # Index the postings stored before the index existed.
+            with conn:
+                conn.execute("INSERT INTO postings_fts (postings_fts) VALUES ('rebuild')")
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record_scrape(self, careers_url: str, jobs, company: str = None, at: float = None,
+                      base_url: str = None) -> dict:
+        """
+        Diffs a page's scraped postings against the stored ones and writes
+        the differences. Postings are grouped by the normalized page URL, so
+        variants such as /careers and /careers/ share one job list.
+
+        Args:
+            careers_url (str): The page the jobs were scraped from.
+            jobs (list[JobRecord]): The complete job list of the page.
+            company (str): The company name, if known.
+            base_url (str): The URL the page was served from after redirects,
+                which its relative links resolve against; defaults to `careers_url`.
+
+        Returns:
+            dict: Counts of "new", "removed" and "changed" postings.
+        """
+        at = at or time.time()
+        page = normalize_url(careers_url)
+        scraped = posting_keys(base_url or careers_url, jobs)
+
+        counts = {"new": 0, "removed": 0, "changed": 0}
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if company is None:
+                    row = conn.execute("SELECT company FROM pages WHERE careers_url = ?", (careers_url,)).fetchone()
+                    company = row["company"] if row else None
+                current = {
+                    row["link"]: row
+                    for row in conn.execute(
+                        "SELECT * FROM postings WHERE careers_url = ? AND removed_at IS NULL", (page,)
+                    )
+                }
+                for link, job in scraped.items():
+                    row = current.get(link)
+                    values = {field: getattr(job, field) for field in POSTING_FIELDS}
+                    if row is None:
+                        conn.execute(
+                            "INSERT INTO postings (link, careers_url, company, title, location, department, first_seen, last_seen)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                            " ON CONFLICT(link) DO UPDATE SET careers_url = excluded.careers_url,"
+                            " company = COALESCE(excluded.company, postings.company),"
+                            " title = excluded.title, location = excluded.location, department = excluded.department,"
+                            " last_seen = excluded.last_seen, removed_at = NULL",
+                            (link, page, company, *values.values(), at, at),
+                        )
+                        self._event(conn, at, "new", link, careers_url, company, values)
+                        counts["new"] += 1
+                        continue
+                    changes = {field: [row[field], value] for field, value in values.items() if row[field] != value}
+                    conn.execute(
+                        "UPDATE postings SET title = ?, location = ?, department = ?,"
+                        " company = COALESCE(?, company), last_seen = ? WHERE link = ?",
+                        (*values.values(), company, at, link),
+                    )
+                    if changes:
+                        self._event(conn, at, "changed", link, careers_url, company, values, changes)
+                        counts["changed"] += 1
+
+                for link, row in current.items():
+                    if link not in scraped:
+                        conn.execute("UPDATE postings SET removed_at = ? WHERE link = ?", (at, link))
+                        values = {field: row[field] for field in POSTING_FIELDS}
+                        self._event(conn, at, "removed", link, careers_url, company or row["company"], values)
+                        counts["removed"] += 1
+        return counts
+
+    @staticmethod
+    def _event(conn, at, kind, link, careers_url, company, values, changes=None):
+        conn.execute(
+            "INSERT INTO events (at, kind, link, careers_url, company, title, location, department, changes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (at, kind, link, careers_url, company, *values.values(), json.dumps(changes) if changes else None),
+        )
+
+    def events_since(self, since: float, kinds=("new",), company: str = None, limit: int = 200) -> list:
+        """
+        Returns posting events after `since` (epoch seconds), newest first.
+
+        Args:
+            kinds (tuple): Any of "new", "removed", "changed".
+            company (str): Only events for this company (case-insensitive substring).
+        """
+        query = f"SELECT * FROM events WHERE at > ? AND kind IN ({', '.join('?' * len(kinds))})"
+        params = [since, *kinds]
+        if company:
+            query += " AND company LIKE ?"
+            params.append(f"%{company}%")
+        query += " ORDER BY at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(query, params)]
+
+    def search(self, query: str = "", location: str = None, company: str = None, department: str = None,
+               include_removed: bool = False, limit: int = 20) -> list:
+        """
+        Searches the stored postings.
+
+        Every word of `query` must match (at least as a prefix) the title, location,
+        department or company; results are ranked by BM25 with the title
+        weighted highest. Filters are case-insensitive substring matches.
+        Without a query, the most recently seen postings come first.
+
+        Returns:
+            list[dict]: Posting rows.
+        """
+        terms = _TERM.findall(query.lower())
+        filters = []
+        params = []
+        for column, value in (("location", location), ("company", company), ("department", department)):
+            if value:
+                filters.append(f"p.{column} LIKE ?")
+                params.append(f"%{value}%")
+        if not include_removed:
+            filters.append("p.removed_at IS NULL")
+
+        with self._lock:
+            conn = self._connect()
+            if terms and self.has_fts:
+                # Whole-word hits score on top of prefix hits, so "engineer" ranks
+                # "Engineer" above "Engineering".
+                match = " AND ".join(f'("{term}" OR "{term}"*)' for term in terms)
+                where = " AND ".join(["postings_fts MATCH ?", *filters])
+                sql = (
+                    f"SELECT p.*, bm25(postings_fts, {', '.join(map(str, FTS_WEIGHTS))}) AS rank"
+                    f" FROM postings_fts JOIN postings p ON p.rowid = postings_fts.rowid"
+                    f" WHERE {where} ORDER BY rank, p.last_seen DESC LIMIT ?"
+                )
+                params = [match, *params]
+            else:
+                text = "(COALESCE(p.title, '') || ' ' || COALESCE(p.location, '') || ' ' ||" \
+                       " COALESCE(p.department, '') || ' ' || COALESCE(p.company, ''))"
+                term_filters = [f"{text} LIKE ?" for _ in terms]
+                where = " AND ".join(term_filters + filters) or "1"
+                title_hits = " + ".join(["(p.title LIKE ?)" for _ in terms]) or "0"
+                sql = (
+                    f"SELECT p.*, -({title_hits}) AS rank FROM postings p"
+                    f" WHERE {where} ORDER BY rank, p.last_seen DESC LIMIT ?"
+                )
+                like_terms = [f"%{term}%" for term in terms]
+                # The title_hits placeholders in the SELECT list come first.
+                params = [*like_terms, *like_terms, *params]
+            return [dict(row) for row in conn.execute(sql, [*params, limit])]
+
+    def add_pages(self, pages, now: float = None):
+        """
+        Registers careers pages for crawling; known pages keep their schedule.
+
+        Args:
+            pages: (careers_url, company) pairs.
+        """
+        now = now or time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO pages (careers_url, company, interval_s, next_due) VALUES (?, ?, ?, ?)",
+                    [(url, company, CRAWL_INITIAL_INTERVAL, now) for url, company in pages],
+                )
+
+    def due_pages(self, now: float = None, limit: int = 100) -> list:
+        """
+        Returns the pages whose next crawl is due, most overdue first.
+        """
+        now = now or time.time()
+        with self._lock:
+            return [
+                dict(row) for row in self._connect().execute(
+                    "SELECT * FROM pages WHERE next_due <= ? ORDER BY next_due LIMIT ?", (now, limit)
+                )
+            ]
+
+    def next_due(self):
+        with self._lock:
+            row = self._connect().execute("SELECT MIN(next_due) AS due FROM pages").fetchone()
+        return row["due"]
+
+    def reschedule(self, careers_url: str, changed: bool, failed: bool = False, now: float = None):
+        """
+        Adapts a page's crawl interval: halved when postings changed, grown by
+        half when nothing changed, doubled per consecutive failure.
+        """
+        now = now or time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT * FROM pages WHERE careers_url = ?", (careers_url,)).fetchone()
+                if row is None:
+                    return
+                interval = row["interval_s"]
+                failures = 0
+                if failed:
+                    failures = row["failures"] + 1
+                    interval = interval * 2
+                elif changed:
+                    interval = interval / 2
+                else:
+                    interval = interval * 1.5
+                interval = min(max(interval, CRAWL_MIN_INTERVAL), CRAWL_MAX_INTERVAL)
+                conn.execute(
+                    "UPDATE pages SET interval_s = ?, next_due = ?, last_crawled = ?, failures = ?,"
+                    " last_changed = CASE WHEN ? THEN ? ELSE last_changed END WHERE careers_url = ?",
+                    (interval, now + interval, now, failures, changed, now, careers_url),
+                )
+
+
+job_store = JobStore()
@@ -1,26 +1,29 @@
+import argparse
 import json
 import os
 import sys
+import time
+from datetime import datetime
 from typing import Any
 import asyncio
 from urllib.parse import urlparse,urljoin
-import httpx
-from mcp.server.fastmcp import FastMCP
-from laststartupScraping import LastStartupScraper  # Make sure this import works
+import logging
+import http_client
+import metrics
+import offload
+import page_tasks
+from job_store import job_store
+from mcp.server.fastmcp import Context, FastMCP
+from page_reduction import CONTENT_TOKEN_BUDGET
+from scrape_pipeline import ScrapeError, resolve_company, scrape_many, stream_jobs
 import re
 
 # Initialize FastMCP server
 mcp = FastMCP("jobs_scraper")
-job_structure_cache_path = "job_structure_cache.json"
 
-BASE_URL = "https://www.lastartup.co.il/funding"
-scraper = LastStartupScraper(BASE_URL)
-# Load cache from disk
-def load_structure_cache():
-    if os.path.exists(job_structure_cache_path):
-        with open(job_structure_cache_path, "r") as f:
-            return json.load(f)
-    return {}
+
+# Jobs per incremental notification sent while a large page is being extracted.
+STREAM_CHUNK_SIZE = int(os.getenv("SCRAPER_STREAM_CHUNK_SIZE", 25))
 
 
 
@@ -39,162 +42,236 @@ def extract_json_array_from_text(raw_text: str):
     except json.JSONDecodeError as e:
         raise ValueError(f"❌ Invalid JSON array: {str(e)}")
     
-@mcp.tool()
-async def get_jobs(company: str) -> str:
-    """Find jobs for a given company from LastStartup.
+def format_job(job, career_page_url=None):
+    if career_page_url is None:
+        return f"- {job.title} ({job.location})"
+    return f"- {job.title} ({job.location}) ({urljoin(career_page_url, job.link)})"
 
-    Args:
-        company: A company name
-    """
-    scraper = LastStartupScraper(BASE_URL)
 
-    # Step 1: Match company name and extract careers URL
-    try:
-        all_links = scraper.get_companies(BASE_URL)
-    except Exception as e:
-        return f"❌ Failed to load companies: {str(e)}"
+def format_jobs(jobs, career_page_url=None):
+    return "\n".join(format_job(job, career_page_url) for job in jobs)
 
-    matched_url = None
-    for entry in all_links:
-        try:
-            data = json.loads(entry)
-            if company.lower() in data["company_name"].lower():
-                matched_url = data["careers_url"]
-                break
-        except json.JSONDecodeError:
-            continue
 
-    if not matched_url:
-        return f"❌ Company '{company}' not found."
+def degraded_note(report: dict) -> str:
+    """
+    Returns the warning appended to a degraded result, or "".
+    """
+    if not report.get("degraded"):
+        return ""
+    note = "\n\n⚠️ These results may be incomplete: " + "; ".join(report.get("problems", []))
+    if report.get("relearning"):
+        note += ". The page structure is being re-learned in the background; try again later."
+    return note
 
-    domain = matched_url
 
-    # Step 2: Download HTML
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(matched_url)
-            response.raise_for_status()
-            html = response.text
-    except Exception as e:
-        return f"❌ Failed to fetch {matched_url}: {str(e)}"
+async def collect_job_lines(jobs, ctx=None, career_page_url=None) -> list:
+    """
+    Formats jobs as the pipeline yields them. With a context, every
+    STREAM_CHUNK_SIZE lines are also sent to the client right away as a log
+    notification, so the first jobs arrive before the page is fully processed.
+    """
+    lines = []
+    chunk = []
+    async for job in jobs:
+        line = format_job(job, career_page_url)
+        lines.append(line)
+        chunk.append(line)
+        if ctx is not None and len(chunk) >= STREAM_CHUNK_SIZE:
+            await ctx.report_progress(len(lines))
+            await ctx.info("\n".join(chunk))
+            chunk = []
+    if ctx is not None and chunk and len(lines) > len(chunk):
+        await ctx.info("\n".join(chunk))
+    return lines
 
-    cleaned_html = LastStartupScraper.clean_html_for_llm_no_spaces(html)
-    llm_content = ""
-    # Step 3: Load cache
-    job_structure_cache = load_structure_cache()
-    #print(domain)
-    
-    # Step 4: Retrieve or infer structure
-    if domain in job_structure_cache:
-        structure = job_structure_cache[domain]
-    else:
-        try:
-            llm_content = extract_json_array_from_text(LastStartupScraper.ask_llm_for_content(cleaned_html,matched_url))
-            structure = LastStartupScraper.extract_consistent_selectors(html, llm_content,domain)
-            job_structure_cache[domain] = structure
-            #save_structure_cache(job_structure_cache)  # Save updated cache
-        except Exception as e:
-            return f"❌ Failed to infer structure for {domain}: {str(e)}"
-
-    # Step 5: Extract jobs
+
+@mcp.tool()
+async def get_jobs(company: str, ctx: Context = None) -> str:
+    """Find jobs for a given company from LastStartup.
+
+    Args:
+        company: A company name
+    """
+    report = {}
     try:
-        jobs = LastStartupScraper.extract_jobs_with_precise_schema(html, structure)
-    except Exception as e:
-        return f"❌ Error parsing jobs: {str(e)}"
+        matched_url = await resolve_company(company)
+        lines = await collect_job_lines(stream_jobs(matched_url, report, company), ctx)
+    except ScrapeError as e:
+        return f"❌ {str(e)}"
 
-    if not jobs:
-        return f"📭 No structured jobs found for {company} on {matched_url}"
+    if not lines:
+        return f"📭 No structured jobs found for {company} on {matched_url}" + degraded_note(report)
 
-    return f"📋 Jobs at {company}:\n\n" + "\n".join(
-        f"- {job['title']} ({job['location']})" for job in jobs
-    )
+    return f"📋 Jobs at {company}:\n\n" + "\n".join(lines) + degraded_note(report)
 
 
 @mcp.tool()
-async def get_jobs_from_url(career_page_url: str) -> str:
+async def get_jobs_from_url(career_page_url: str, ctx: Context = None) -> str:
     """Find jobs from a given career page url.
 
     Args:
         career_page_url: A career page url.
     """
-    scraper = LastStartupScraper(BASE_URL)
-
-    
     if not career_page_url:
         return f"❌ page '{career_page_url}' not found."
 
-    domain = career_page_url
-
-    # Step 2: Download HTML
+    report = {}
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(career_page_url)
-            response.raise_for_status()
-            html = response.text
-    except Exception as e:
-        return f"❌ Failed to fetch {career_page_url}: {str(e)}"
+        lines = await collect_job_lines(stream_jobs(career_page_url, report), ctx, career_page_url)
+    except ScrapeError as e:
+        return f"❌ {str(e)}"
 
-    cleaned_html = LastStartupScraper.clean_html_for_llm_no_spaces(html)
+    if not lines:
+        return f"📭 No structured jobs found for  {career_page_url}" + degraded_note(report)
 
-    # Step 3: Load cache
-    job_structure_cache = load_structure_cache()
-    llm_content = ""
-    # Step 4: Retrieve or infer structure
-    if domain in job_structure_cache:
-        structure = job_structure_cache[domain]
-    
-    else:
-        try:
-            llm_content = extract_json_array_from_text(LastStartupScraper.ask_llm_for_content(cleaned_html,career_page_url))
-            structure = LastStartupScraper.extract_consistent_selectors(html, llm_content,domain)
-            job_structure_cache[domain] = structure
-        except Exception as e:
-            return f"❌ Failed to infer structure for {domain} for content {llm_content}: {str(e)}"
-
-    # Step 5: Extract jobs
-    try:
-        jobs = LastStartupScraper.extract_jobs_with_precise_schema(html, structure)
-    except Exception as e:
-        llm_content = extract_json_array_from_text(LastStartupScraper.ask_llm_for_content(cleaned_html,career_page_url))
-        structure = LastStartupScraper.extract_consistent_selectors(html, llm_content,domain)
-        job_structure_cache[domain] = structure
-        return f"❌ Error parsing jobs {llm_content}: {str(e)}"
+    return f"📋 Jobs at {career_page_url}:\n\n" + "\n".join(lines) + degraded_note(report)
+
+
+@mcp.tool()
+async def get_jobs_batch(targets: list[str], max_concurrency: int = 8, ctx: Context = None) -> str:
+    """Find jobs for many companies and/or career page urls at once.
+
+    Targets are scraped concurrently; progress is reported as each one finishes
+    and a failing target does not affect the others.
 
-    if not jobs:
-        return f"📭 No structured jobs found for  {career_page_url}"
+    Args:
+        targets: Company names or career page urls (anything starting with http is treated as a url)
+        max_concurrency: How many targets to scrape at the same time
+    """
+    results = [None] * len(targets)
+    done = 0
+    async for index, target, url, jobs, error in scrape_many(targets, max_concurrency):
+        if error:
+            results[index] = f"❌ {target}: {error}"
+        elif not jobs:
+            results[index] = f"📭 {target}: no structured jobs found on {url}"
+        else:
+            results[index] = f"📋 {target} ({url}):\n" + format_jobs(jobs, url)
+        done += 1
+        if ctx is not None:
+            await ctx.report_progress(done, len(targets))
+            await ctx.info(results[index])
 
-    return f"📋 Jobs at {career_page_url}:\n\n" + "\n".join(
-        f"- {job['title']} ({job['location']}) ({urljoin(career_page_url, job['link'])})" for job in jobs
-    )
+    return "\n\n".join(results)
 
 
 
 @mcp.tool()
-async def get_job_page_content(url: str) -> str:
+async def get_job_page_content(url: str, mode: str = "main", max_tokens: int = CONTENT_TOKEN_BUDGET) -> str:
     """Fetch and clean the HTML content of a given job page.
 
     Args:
         url: The full URL to a job posting (e.g., https://example.com/careers/software-engineer)
+        mode: "main" for the job description only, without navigation and footers; "full" for the whole page text
+        max_tokens: Approximate size limit of the returned text (0 for no limit)
     """
+    if mode not in ("main", "full"):
+        return f"❌ Unknown mode '{mode}': use 'main' or 'full'."
     job_page = ""
     try:
-        async with httpx.AsyncClient(timeout=10, headers={
-            "User-Agent": "Mozilla/5.0"
-        }) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            job_page = response.text
+        job_page = (await http_client.fetch_cached(url)).text
     except Exception as e:
         return f"❌ Failed to fetch job page: {str(e)}"
 
     try:
-        cleaned = LastStartupScraper.clean_html_for_llm_no_spaces(job_page)
-        return cleaned
+        return await offload.run(page_tasks.page_text, job_page, mode, max_tokens, size=len(job_page))
     except Exception as e:
         return f"❌ Failed to clean HTML: {str(e)}"
 
 
+def parse_since(since: str) -> float:
+    """
+    Parses "30m", "24h", "7d", "2w" or an ISO date/datetime into epoch seconds.
+    """
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    since = since.strip().lower()
+    match = re.fullmatch(r"(\d+)\s*([mhdw])", since)
+    if match:
+        return time.time() - int(match.group(1)) * units[match.group(2)]
+    return datetime.fromisoformat(since).timestamp()
+
+
+@mcp.tool()
+async def get_new_jobs(since: str = "24h", company: str = "", include_removed: bool = False) -> str:
+    """List job postings that appeared since a given time, from the local crawl store (no scraping).
+
+    Args:
+        since: How far back: "24h", "7d", "2w" or an ISO date like 2025-01-31
+        company: Only this company (optional)
+        include_removed: Also list postings that were taken down and postings that changed
+    """
+    try:
+        start = parse_since(since)
+    except ValueError:
+        return f"❌ Cannot parse since='{since}'. Use e.g. 24h, 7d or 2025-01-31."
+
+    kinds = ("new", "removed", "changed") if include_removed else ("new",)
+    events = job_store.events_since(start, kinds, company or None)
+    if not events:
+        return f"📭 No new jobs since {datetime.fromtimestamp(start):%Y-%m-%d %H:%M}"
+
+    lines = []
+    for event in events:
+        seen = datetime.fromtimestamp(event["at"]).strftime("%Y-%m-%d %H:%M")
+        prefix = "" if event["kind"] == "new" else f"[{event['kind']}] "
+        lines.append(f"- {prefix}{event['title']} ({event['location']}) at {event['company'] or event['careers_url']} ({event['link']}) — {seen}")
+    return f"📋 Job changes since {datetime.fromtimestamp(start):%Y-%m-%d %H:%M}:\n\n" + "\n".join(lines)
+
+
+@mcp.tool()
+async def search_jobs(query: str = "", location: str = "", company: str = "", department: str = "",
+                      include_removed: bool = False, limit: int = 20) -> str:
+    """Search all job postings scraped so far, across companies, from the local index (no scraping).
+
+    Args:
+        query: Words to match in the title, location, department or company, e.g. "backend engineer"
+        location: Only postings whose location contains this, e.g. "Tel Aviv"
+        company: Only postings of companies whose name contains this
+        department: Only postings whose department contains this
+        include_removed: Also return postings that have been taken down
+        limit: Maximum number of results
+    """
+    if not any((query, location, company, department)):
+        return "❌ Give a query or at least one filter."
+
+    with metrics.span("search", query=query) as span:
+        rows = job_store.search(query, location or None, company or None, department or None,
+                                include_removed, max(1, min(limit, 200)))
+        span["results"] = len(rows)
+    if not rows:
+        return "📭 No matching jobs in the local index. Scrape companies with get_jobs or run the crawler first."
+
+    lines = []
+    for row in rows:
+        removed = " [removed]" if row["removed_at"] else ""
+        lines.append(f"- {row['title']} ({row['location']}) at {row['company'] or row['careers_url']} ({row['link']}){removed}")
+    return f"📋 {len(rows)} matching jobs:\n\n" + "\n".join(lines)
+
+
+@mcp.tool()
+async def get_scraper_stats() -> str:
+    """Get the scraper's runtime metrics: per-stage timings, cache hit/miss counters and LLM latency/token histograms (JSON)."""
+    return json.dumps(metrics.snapshot(), indent=2)
+
+
 if __name__ == "__main__":
-    print("Hello from Jobs Scraper!")
+    parser = argparse.ArgumentParser(description="Jobs Scraper MCP server")
+    parser.add_argument("--crawl", action="store_true",
+                        help="run the scheduled crawler instead of the MCP server")
+    parser.add_argument("--once", action="store_true", help="with --crawl: run a single sweep and exit")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="with --crawl: pages crawled at once")
+    args = parser.parse_args()
+
+    # stdout carries the stdio MCP transport; all diagnostics go to stderr.
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    logging.getLogger(__name__).info("Hello from Jobs Scraper!")
 
-    mcp.run(transport='stdio')  # Run the FastMCP instance
+    try:
+        if args.crawl:
+            from crawler import CRAWL_MAX_CONCURRENCY, run_crawler
+            asyncio.run(run_crawler(max_concurrency=args.max_concurrency or CRAWL_MAX_CONCURRENCY, once=args.once))
+        else:
+            mcp.run(transport='stdio')  # Run the FastMCP instance
+    finally:
+        # Stops the page-work pool's threads or worker processes.
+        offload.shutdown()
@@ -1,28 +1,128 @@
-import requests
-from bs4 import BeautifulSoup, NavigableString, Comment
+# LangChain, the Groq client, requests and BeautifulSoup are imported on first
+# use, not here: serving cached schemas never needs them, and they dominate
+# the MCP server's startup time.
+import httpx
 import re
 import json , os
-from langchain_groq import ChatGroq
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableSequence
-from lxml import html
-from collections import defaultdict
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+import http_client
+import metrics
+from schema_store import structure_cache
+from parsed_page import ParsedPage, css_path
+from extraction_plan import ExtractionPlan, compile_schema, css_to_xpath, generalize_schema
+from structure_detector import JSON_LD_SOURCE, iter_json_ld_jobs
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "llama3-8b-8192"
+# Max number of LLM inferences in flight at once across all tool calls.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 2))
+
+CONTENT_SYSTEM_PROMPT = """
+            You are a highly accurate HTML-to-JSON converter specialized in career pages.
+
+            Your task is to extract job listings from the simplified *text* of a company's careers webpage.
+
+            The input will be plain visible text (not raw HTML), already cleaned of irrelevant tags and attributes.
+
+            🧠 Your goal is to:
+            - Identify recurring job listing blocks.
+            - Extract the following fields from each:
+                - "title": The job title
+                - "link": A link to the job detail page (if available in the text)
+                - "location": The location (if provided)
+                - "department": The department/category (if provided)
+
+            🎯 Output Requirements:
+            - Return a **list of job objects** in **pure JSON**
+            - Each object must have at least the "title" field
+            - No explanations. No markdown. No formatting hints.
+            - Just raw valid JSON.
 
+            Example output format:
+            [
+            {
+                "title": "Frontend Developer",
+                "link": "/careers/frontend-developer", 
+                "location": "Remote",
+                "department": "Engineering"
+            },
+            ...
+            ]
 
-# Load Groq API key
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is missing")
+            Only return valid JSON. No explanation.
+            ❌ No explanations
+            ❌ No code blocks
+            ✅ Only valid JSON
 
-# Use LLaMA 3 for summarization
-llm = ChatGroq(
-    model="llama3-8b-8192",
-    api_key=groq_api_key
-)
+            """
 
+CONTENT_PROMPT_TEMPLATE = """
+    {system_prompt}
 
+    📝 Domain: {domain}
 
+    📄 Cleaned HTML text:
+    {cleaned_html}
+    """
+
+_llm = None
+_content_chain = None
+_output_parser = None
+_llm_semaphore = None
+_inflight_llm_requests = {}
+
+
+def get_llm():
+    """
+    Returns the Groq chat model, creating it on first use.
+
+    Raises:
+        ValueError: If GROQ_API_KEY is not set.
+    """
+    global _llm
+    if _llm is None:
+        # Load Groq API key
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        if not groq_api_key:
+            raise ValueError("GROQ_API_KEY environment variable is missing")
+
+        from langchain_groq import ChatGroq
+
+        # Use LLaMA 3 for summarization
+        _llm = ChatGroq(
+            model=LLM_MODEL,
+            api_key=groq_api_key
+        )
+    return _llm
+
+
+def _get_output_parser():
+    global _output_parser
+    if _output_parser is None:
+        from langchain_core.output_parsers import StrOutputParser
+        _output_parser = StrOutputParser()
+    return _output_parser
+
+
+@dataclass(slots=True)
+class JobRecord:
+    """A single extracted job posting."""
+    title: str
+    link: str = ""
+    location: str = ""
+    department: str = ""
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "link": self.link,
+            "location": self.location,
+            "department": self.department,
+        }
 
 
 
@@ -43,12 +143,14 @@ class LastStartupScraper:
         Returns:
             str: The HTML content of the page, or None if an error occurs.
         """
+        import requests
+
         try:
             response = requests.get(url)
             response.raise_for_status()
             return response.text
         except requests.RequestException as e:
-            print(f"Error fetching page: {e}")
+            logger.warning(f"Error fetching page: {e}")
             return None
 
     def get_companies(self, url):
@@ -61,109 +163,143 @@ class LastStartupScraper:
         Returns:
             list: A list of company links.
         """
+        import requests
+
         try:
             response = requests.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Find all <div> elements with role="listitem" and class="w-dyn-item"
-            items = soup.find_all('div', attrs={'role': 'listitem'}, class_='w-dyn-item')
-
-            company_links = []
-
-            # Iterate over each item and extract the desired link
-            for item in items:
-                company_div = item.find('div', class_='funding-company-title')
-                if not company_div:
-                    continue
-
-                # Look for <a> tags that contain a div with class 'text-block-404' and text 'אתר בית'
-                links = item.find_all('a', href=True)
-                for link in links:
-                    text_block = link.find('div', class_='text-block-404')
-                    if text_block and text_block.get_text(strip=True) == 'אתר בית':
-                        company_links.append(json.dumps({'company_name':company_div.text,'careers_url':link['href'].rstrip('/')+'/careers'}))
-
-            return company_links
+            return LastStartupScraper.parse_companies(response.content)
         except requests.RequestException as e:
-            print(f"Error scraping companies: {e}")
+            logger.warning(f"Error scraping companies: {e}")
             return []
-    
-
 
+    async def get_companies_async(self, url):
+        """
+        Async variant of get_companies using the shared HTTP client, so the
+        MCP event loop is never blocked on the funding page download.
+        """
+        try:
+            response = await http_client.fetch(url)
+            return LastStartupScraper.parse_companies(response.content)
+        except httpx.HTTPError as e:
+            logger.warning(f"Error scraping companies: {e}")
+            return []
 
     @staticmethod
-    def ask_llm_for_content(cleaned_html, domain):
-        system_prompt = """
-            You are a highly accurate HTML-to-JSON converter specialized in career pages.
+    def parse_companies(content):
+        """
+        Extracts company links from the funding page HTML.
 
-            Your task is to extract job listings from the simplified *text* of a company's careers webpage.
+        Args:
+            content (str | bytes): The funding page HTML.
 
-            The input will be plain visible text (not raw HTML), already cleaned of irrelevant tags and attributes.
+        Returns:
+            list: A list of company links.
+        """
+        from bs4 import BeautifulSoup
 
-            🧠 Your goal is to:
-            - Identify recurring job listing blocks.
-            - Extract the following fields from each:
-                - "title": The job title
-                - "link": A link to the job detail page (if available in the text)
-                - "location": The location (if provided)
-                - "department": The department/category (if provided)
+        soup = BeautifulSoup(content, 'html.parser')
 
-            🎯 Output Requirements:
-            - Return a **list of job objects** in **pure JSON**
-            - Each object must have at least the "title" field
-            - No explanations. No markdown. No formatting hints.
-            - Just raw valid JSON.
+        # Find all <div> elements with role="listitem" and class="w-dyn-item"
+        items = soup.find_all('div', attrs={'role': 'listitem'}, class_='w-dyn-item')
 
-            Example output format:
-            [
-            {
-                "title": "Frontend Developer",
-                "link": "/careers/frontend-developer", 
-                "location": "Remote",
-                "department": "Engineering"
-            },
-            ...
-            ]
+        company_links = []
 
-            Only return valid JSON. No explanation.
-            ❌ No explanations
-            ❌ No code blocks
-            ✅ Only valid JSON
+        # Iterate over each item and extract the desired link
+        for item in items:
+            company_div = item.find('div', class_='funding-company-title')
+            if not company_div:
+                continue
 
-            """
+            # Look for <a> tags that contain a div with class 'text-block-404' and text 'אתר בית'
+            links = item.find_all('a', href=True)
+            for link in links:
+                text_block = link.find('div', class_='text-block-404')
+                if text_block and text_block.get_text(strip=True) == 'אתר בית':
+                    company_links.append(json.dumps({'company_name':company_div.text,'careers_url':link['href'].rstrip('/')+'/careers'}))
 
-        # Build the full prompt (system + user message)
-        full_prompt = PromptTemplate(
-            input_variables=["cleaned_html", "domain"],
-            template="""
-    {system_prompt}
+        return company_links
+    
 
-    📝 Domain: {domain}
 
-    📄 Cleaned HTML text:
-    {cleaned_html}
-    """
-        )
 
-        chain = RunnableSequence(
-            full_prompt.partial(system_prompt=system_prompt) |
-            llm |
-            StrOutputParser()
-        )
+    @staticmethod
+    def _get_content_chain():
+        """
+        Builds the prompt | llm chain once and reuses it for every call. The
+        output parser runs separately so the message's token usage can be recorded.
+        """
+        global _content_chain
+        if _content_chain is None:
+            from langchain_core.prompts import PromptTemplate
+            from langchain_core.runnables import RunnableSequence
+
+            full_prompt = PromptTemplate(
+                input_variables=["cleaned_html", "domain"],
+                template=CONTENT_PROMPT_TEMPLATE
+            )
+            _content_chain = RunnableSequence(
+                full_prompt.partial(system_prompt=CONTENT_SYSTEM_PROMPT) |
+                get_llm()
+            )
+        return _content_chain
+
+    @staticmethod
+    def _record_llm_usage(message, span):
+        usage = getattr(message, "usage_metadata", None) or {}
+        for key in ("input_tokens", "output_tokens", "total_tokens"):
+            if usage.get(key) is not None:
+                span[key] = usage[key]
+                metrics.observe(f"llm.{key}", usage[key])
 
-        return chain.invoke({
-            "domain": domain,
-            "cleaned_html": cleaned_html
-        })
+    @staticmethod
+    def ask_llm_for_content(cleaned_html, domain):
+        with metrics.span("llm", domain=domain, prompt_chars=len(cleaned_html)) as span:
+            message = LastStartupScraper._get_content_chain().invoke({
+                "domain": domain,
+                "cleaned_html": cleaned_html
+            })
+            LastStartupScraper._record_llm_usage(message, span)
+        return _get_output_parser().invoke(message)
+
+    @staticmethod
+    async def ask_llm_for_content_async(cleaned_html, domain):
+        """
+        Non-blocking variant of ask_llm_for_content for the async MCP tools.
+
+        At most LLM_MAX_CONCURRENCY inferences run at once, and identical
+        concurrent requests (same domain and page text) share one inference.
+        """
+        key = (domain, hashlib.sha1(cleaned_html.encode("utf-8")).hexdigest())
+        pending = _inflight_llm_requests.get(key)
+        if pending is not None:
+            metrics.incr("llm.coalesced")
+            return await asyncio.shield(pending)
+
+        async def run():
+            global _llm_semaphore
+            if _llm_semaphore is None:
+                _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+            async with _llm_semaphore:
+                with metrics.span("llm", domain=domain, prompt_chars=len(cleaned_html)) as span:
+                    message = await LastStartupScraper._get_content_chain().ainvoke({
+                        "domain": domain,
+                        "cleaned_html": cleaned_html
+                    })
+                    LastStartupScraper._record_llm_usage(message, span)
+                return _get_output_parser().invoke(message)
+
+        task = asyncio.ensure_future(run())
+        _inflight_llm_requests[key] = task
+        task.add_done_callback(lambda _: _inflight_llm_requests.pop(key, None))
+        return await asyncio.shield(task)
 
     @staticmethod     
     def load_structure_cache():
-        return json.load(open('job_structure_cache.json')) if os.path.exists('job_structure_cache.json') else {}
+        return dict(structure_cache.items())
     @staticmethod
     def save_structure_cache(cache):
-        with open('job_structure_cache.json', 'w') as f:
-            json.dump(cache, f, indent=2)
+        structure_cache.update(cache)
 
     def get_or_learn_structure(domain, html):
         cache = LastStartupScraper.load_structure_cache()
@@ -176,7 +312,7 @@ class LastStartupScraper:
         try:
             structure = json.loads(response)
         except json.JSONDecodeError:
-            print("⚠️ Failed to parse structure from LLM:", response)
+            logger.warning(f"⚠️ Failed to parse structure from LLM: {response}")
             return None
 
         cache[domain] = structure
@@ -184,13 +320,15 @@ class LastStartupScraper:
         return structure
     @staticmethod
     def scrape_jobs_with_structure(html, structure):
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, 'html.parser')
         jobs = []
         container_selector = structure['job_container']
-        print(f"🔍 Using job container selector: {container_selector}")
+        logger.debug(f"🔍 Using job container selector: {container_selector}")
         
         for job in soup.select(structure['job_container']):
-            print(job)
+            logger.debug(job)
             title_el = job.select_one(structure['title'])
             link_el = job.select_one(structure['link'])
             loc_el = job.select_one(structure.get('location', ''))
@@ -204,38 +342,21 @@ class LastStartupScraper:
         return jobs
     @staticmethod
     def clean_html_for_llm_no_spaces(html):
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Remove noisy tags
-        tags_to_remove = [
-            'img', 'script', 'style', 'head', 'footer', 'svg', 'iframe',
-            'noscript', 'link', 'meta', 'form', 'aside', 'nav', 'canvas',
-            'object', 'video', 'audio', 'picture', 'source'
-        ]
-        for tag_name in tags_to_remove:
-            for tag in soup.find_all(tag_name):
-                tag.decompose()
-
-        # Clean attributes and inline links
-        for tag in soup.find_all(True):
-            if tag.name == 'a' and tag.has_attr('href'):
-                tag.string = f"{tag.get_text(strip=True)} [{tag['href']}]"
-                tag.attrs = {}
-            else:
-                tag.attrs.clear()
-
-        # Extract and minify text
-        raw_text = soup.get_text(separator='\n', strip=True)
-        raw_text = re.sub(r'\s+', ' ', raw_text)           # collapse multiple spaces
-        raw_text = re.sub(r'\s*\n\s*', '\n', raw_text)     # normalize newlines
-        cleaned_text = raw_text.strip()                    # remove leading/trailing spaces
+        """
+        Returns the visible text of a page on one line: noise tags removed and
+        links inlined as "text [href]".
 
-        return cleaned_text
+        Args:
+            html (str | ParsedPage): Raw HTML, or a page already parsed for this fetch.
+        """
+        return ParsedPage.ensure(html).visible_text()
     
 
     @staticmethod
     def get_css_selector(tag):
         """Build a CSS selector for a given tag"""
+        if hasattr(tag, "getparent"):
+            return css_path(tag)
         path = []
         while tag and tag.name != '[document]':
             name = tag.name
@@ -252,6 +373,8 @@ class LastStartupScraper:
     
     @staticmethod
     def find_tag_with_exact_text_or_attribute(soup, text):
+        if isinstance(soup, ParsedPage):
+            return soup.find_text_or_attribute(text)
         text = text.strip()
         def match(tag):
             # Match against visible text
@@ -267,20 +390,26 @@ class LastStartupScraper:
 
     @staticmethod
     def update_schema_cache(domain, schema):
-        cache_file = "job_structure_cache.json"
-        if os.path.exists(cache_file):
-            with open(cache_file, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-        else:
-            cache = {}
-
-        cache[domain] = schema
-
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
+        structure_cache.put(domain, schema)
     @staticmethod
     def extract_consistent_selectors(html, jobs, domain):
-        soup = BeautifulSoup(html, "html.parser")
+        """
+        Learns a schema from the jobs an LLM found on the page and caches it
+        for `domain`. Returns None if the jobs' fields do not share selectors.
+        """
+        schema = LastStartupScraper.consistent_selectors(html, jobs)
+        if schema is not None:
+            LastStartupScraper.update_schema_cache(domain, schema)
+        return schema
+
+    @staticmethod
+    def consistent_selectors(html, jobs):
+        """
+        The schema shared by every job's title, link and location elements,
+        relative to the job card (see generalize_schema), or None. Touches no
+        cache, so it can run in a worker process.
+        """
+        page = ParsedPage.ensure(html)
         fields = ["title", "link", "location"]
         
         selectors = {field: [] for field in fields}
@@ -290,9 +419,9 @@ class LastStartupScraper:
                 value = job.get(field)
                 if not value:
                     continue
-                tag = LastStartupScraper.find_tag_with_exact_text_or_attribute(soup, value)
+                tag = LastStartupScraper.find_tag_with_exact_text_or_attribute(page, value)
                 #print(tag)
-                if tag:
+                if tag is not None:
                     selectors[field].append(LastStartupScraper.get_css_selector(tag))
 
         schema = {}
@@ -301,13 +430,12 @@ class LastStartupScraper:
             if len(set(selector_list)) == 1:
                 schema[field] = selector_list[0]
             else:
-                print(f"❌ Inconsistent selectors for '{field}': {set(selector_list)}")
+                logger.warning(f"❌ Inconsistent selectors for '{field}': {set(selector_list)}")
                 return None
 
-        # ✅ Save schema if trusted
+        # ✅ Trusted schema, relative to the job card so it fits the whole site
         #print(f"✅ Trusted schema extracted: {schema}")
-        LastStartupScraper.update_schema_cache(domain, schema)
-        return schema
+        return generalize_schema(schema, page.tree)
     
     @staticmethod
     def clean_selector(selector: str) -> str:
@@ -327,70 +455,57 @@ class LastStartupScraper:
     import re
     @staticmethod
     def css_to_xpath(tailwind_selector: str) -> str:
-        parts = tailwind_selector.split(" > ")
-        xpath_parts = []
-
-        for part in parts:
-            tag = "div"  # default if tag is missing
-            classes = []
-
-            # Handle ID selector
-            if "#" in part:
-                tag, id_part = part.split("#", 1)
-                id_xpath = f"{tag}[@id='{id_part}']"
-                xpath_parts.append(id_xpath)
-                continue
-
-            # Extract tag and classes (e.g., div.class1.class2)
-            match = re.match(r"(\w+)((?:\.\S+)+)?", part)
-            if match:
-                tag = match.group(1)
-                class_str = match.group(2)
-                if class_str:
-                    class_names = class_str.strip(".").split(".")
-                    class_conditions = " and ".join(
-                        [f"contains(@class, '{cls}')" for cls in class_names]
-                    )
-                    xpath_parts.append(f"{tag}[{class_conditions}]")
-                else:
-                    xpath_parts.append(tag)
-            else:
-                xpath_parts.append(part)  # fallback
-
-        return "/" + "/".join(xpath_parts)
+        return css_to_xpath(tailwind_selector)
 
     @staticmethod
-    def extract_fields_from_html(html_content: str, selector_dict: dict):
-        tree = html.fromstring(html_content)
-        results = {}
-
-        for key, css_selector in selector_dict.items():
-            xpath = LastStartupScraper.css_to_xpath(css_selector)
-            results[key] = tree.xpath(xpath)  # ⬅️ don't convert to text here
+    def extract_fields_from_html(html_content, selector_dict: dict):
+        """
+        Evaluates every field of a schema against the page.
 
-        return results
+        Args:
+            html_content (str | ParsedPage): The page.
+            selector_dict (dict | ExtractionPlan): A schema, or its precompiled plan.
+        """
+        tree = ParsedPage.ensure(html_content).tree
+        plan = selector_dict if isinstance(selector_dict, ExtractionPlan) else compile_schema(selector_dict)
+        return plan.evaluate(tree)  # ⬅️ don't convert to text here
 
     @staticmethod
-    def extract_jobs_with_precise_schema(html: str, schema: dict) -> list:
-        html_content = html.encode("utf-8")
-        results = LastStartupScraper.extract_fields_from_html(html, schema)
-
-        titles = results.get("title", [])
-        links = results.get("link", [])
-        locations = results.get("location", [])
-        
-        jobs = []
-        count = max(len(titles), len(links), len(locations) if locations else len(titles))
+    def iter_jobs_with_precise_schema(html, schema):
+        """
+        Yields one JobRecord per job card, with every field looked up inside
+        its card (see ExtractionPlan.iter_cards), building each record's
+        strings only when it is consumed.
 
-        for i in range(count):
-            job = {
-                "title": titles[i].text_content().strip() if i < len(titles) else "",
-                "link": links[i].get("href", "") if i < len(links) else "",
-                "location": locations[i].text_content().strip() if i < len(locations) else "",
-            }
-            jobs.append(job)
+        Args:
+            html (str | ParsedPage): The careers page.
+            schema (dict | ExtractionPlan): A schema, or its precompiled plan.
+        """
+        source = schema.source if isinstance(schema, ExtractionPlan) else schema.get("source")
+        if source == JSON_LD_SOURCE:
+            for job in iter_json_ld_jobs(ParsedPage.ensure(html)):
+                yield JobRecord(**job)
+            return
+
+        plan = schema if isinstance(schema, ExtractionPlan) else compile_schema(schema)
+        if plan.container is None:
+            return
+
+        def text(element):
+            return element.text_content().strip() if element is not None else ""
+
+        for card in plan.iter_cards(ParsedPage.ensure(html).tree):
+            link = card.get("link")
+            yield JobRecord(
+                title=text(card.get("title")),
+                link=link.get("href", "") if link is not None else "",
+                location=text(card.get("location")),
+                department=text(card.get("department")),
+            )
 
-        return jobs
+    @staticmethod
+    def extract_jobs_with_precise_schema(html, schema: dict) -> list:
+        return [job.to_dict() for job in LastStartupScraper.iter_jobs_with_precise_schema(html, schema)]
 
 
 def extract_json_array_from_text(raw_text: str):
@@ -409,5 +524,5 @@ def extract_json_array_from_text(raw_text: str):
         raise ValueError(f"❌ Invalid JSON array: {str(e)}")
    
 if __name__ == "__main__":
-    print("main method for testing")
+    logger.info("main method for testing")
     
\ No newline at end of file
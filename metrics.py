@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Where span/event records go as JSON lines: "stderr" (default), "off", or a file path.
+# Never stdout: that is the stdio MCP transport.
+METRICS_LOG = os.getenv("SCRAPER_METRICS_LOG", "stderr")
+# Samples kept per histogram for percentile estimates.
+HISTOGRAM_RESERVOIR = int(os.getenv("SCRAPER_METRICS_RESERVOIR", 1024))
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_histograms = {}
+_started_at = time.time()
+
+
+def _make_emitter():
+    emitter = logging.getLogger("scraper.metrics")
+    emitter.propagate = False
+    emitter.setLevel(logging.INFO)
+    if METRICS_LOG == "off":
+        emitter.disabled = True
+    elif METRICS_LOG == "stderr":
+        emitter.addHandler(logging.StreamHandler(sys.stderr))
+    else:
+        emitter.addHandler(logging.FileHandler(METRICS_LOG, encoding="utf-8"))
+    return emitter
+
+
+_emitter = _make_emitter()
+
+
+class Histogram:
+    """
+    Running count/sum/min/max plus a bounded sample window for percentiles.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=HISTOGRAM_RESERVOIR)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+def emit(record: dict):
+    """
+    Writes one JSON record to the metrics log.
+    """
+    if not _emitter.disabled:
+        _emitter.info(json.dumps({"ts": round(time.time(), 3), **record}, ensure_ascii=False, default=str))
+
+
+def incr(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(value)
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Times a pipeline stage. The duration goes into the `span.<stage>.ms`
+    histogram and one JSON record is emitted. Attributes can be added to the
+    yielded dict while the span is open.
+
+        with metrics.span("fetch", url=url) as s:
+            s["from_cache"] = True
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield attrs
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record_span(stage, (time.perf_counter() - start) * 1000, ok=ok, **attrs)
+
+
+def record_span(stage: str, ms: float, ok: bool = True, **attrs):
+    """
+    Records a span whose duration was measured by the caller.
+    """
+    observe(f"span.{stage}.ms", ms)
+    if not ok:
+        incr(f"span.{stage}.errors")
+    emit({"type": "span", "stage": stage, "ms": round(ms, 3), "ok": ok, **attrs})
+
+
+def snapshot() -> dict:
+    """
+    Returns all counters and histogram summaries.
+    """
+    with _lock:
+        return {
+            "uptime_s": round(time.time() - _started_at, 1),
+            "counters": dict(sorted(_counters.items())),
+            "histograms": {name: histogram.summary() for name, histogram in sorted(_histograms.items())},
+        }
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Where CPU-bound page work (parsing, cleaning, structure detection,
+# extraction) runs: "thread" (lxml releases the GIL while parsing and
+# evaluating XPath), "process" (scales across cores for crawler sweeps) or
+# "off" (on the event loop).
+OFFLOAD_MODE = os.getenv("SCRAPER_OFFLOAD_MODE", "thread").lower()
+# Pages smaller than this (in characters) are handled inline: handing them
+# to a worker costs more than the work itself.
+OFFLOAD_MIN_BYTES = int(os.getenv("SCRAPER_OFFLOAD_MIN_BYTES", 200_000))
+# Pool size; 0 means one worker per core.
+OFFLOAD_WORKERS = int(os.getenv("SCRAPER_OFFLOAD_WORKERS", 0)) or os.cpu_count() or 1
+
+if OFFLOAD_MODE not in ("off", "thread", "process"):
+    logger.warning("Unknown SCRAPER_OFFLOAD_MODE %r, running page work inline", OFFLOAD_MODE)
+    OFFLOAD_MODE = "off"
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if OFFLOAD_MODE == "process":
+            # spawn, not fork: the parent has an event loop and helper threads running.
+            _executor = ProcessPoolExecutor(OFFLOAD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            _executor = ThreadPoolExecutor(OFFLOAD_WORKERS, thread_name_prefix="offload")
+    return _executor
+
+
+def should_offload(size: int) -> bool:
+    return OFFLOAD_MODE != "off" and size >= OFFLOAD_MIN_BYTES
+
+
+async def run(func, *args, size: int = 0):
+    """
+    Runs the CPU-bound call `func(*args)` without blocking the event loop
+    when the input is at least OFFLOAD_MIN_BYTES, inline otherwise. In
+    process mode `func`, its arguments and its result must be picklable.
+
+    Args:
+        size (int): Size of the input the work scales with, usually the page length.
+    """
+    if not should_offload(size):
+        metrics.incr("offload.inline")
+        return func(*args)
+    metrics.incr(f"offload.{OFFLOAD_MODE}")
+    executor = _get_executor()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); the next call gets a fresh pool.
+        global _executor
+        if _executor is executor:
+            _executor = None
+        executor.shutdown(wait=False)
+        raise
+
+
+async def iterate(func, *args, size: int = 0):
+    """
+    Like run() for a generator function: yields the items of `func(*args)`
+    as they are produced. For inputs of at least OFFLOAD_MIN_BYTES the
+    generator runs in the thread pool and hands each item back to the event
+    loop through a queue. Not available in process mode: a generator cannot
+    be consumed across processes.
+    """
+    if not should_offload(size):
+        metrics.incr("offload.inline")
+        for item in func(*args):
+            yield item
+        return
+    if OFFLOAD_MODE == "process":
+        raise RuntimeError("offload.iterate cannot run in a process pool")
+    metrics.incr(f"offload.{OFFLOAD_MODE}")
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in func(*args):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    future = loop.run_in_executor(_get_executor(), produce)
+    try:
+        while (item := await queue.get()) is not done:
+            yield item
+        await future  # re-raises an exception from the generator
+    finally:
+        # The consumer stopped early; let the worker finish quietly.
+        stop.set()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
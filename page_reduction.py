@@ -0,0 +1,230 @@
+import os
+import re
+
+from parsed_page import NOISE_TAGS, ParsedPage
+
+# Page text sent to the LLM for structure inference, in (estimated) tokens.
+# llama3-8b has an 8K context; the rest is left for the prompt and the answer.
+LLM_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", 3000))
+# Rough chars-per-token ratio used to estimate prompt size without a tokenizer.
+CHARS_PER_TOKEN = 4
+# Job page text returned to the agent by get_job_page_content, in (estimated) tokens.
+CONTENT_TOKEN_BUDGET = int(os.getenv("SCRAPER_CONTENT_TOKEN_BUDGET", 2000))
+# A semantic <article>/<main> block must carry this much text to count as the page's content.
+MAIN_MIN_CHARS = 200
+# The content search descends into a child holding at least this share of its parent's text.
+MAIN_DESCEND_SHARE = 0.6
+# Minimum number of same-shaped siblings for a block to count as a listing.
+MIN_REPEATS = 3
+
+_HEADING = re.compile(r"^h[1-6]$")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def shape_signature(element):
+    """
+    The "shape" of a subtree: its tag, classes and the tags of its element
+    children. Job cards rendered from one template share it.
+    """
+    children = tuple(child.tag for child in element if isinstance(child.tag, str))
+    return element.tag, element.get("class", ""), children
+
+
+def _in_noise(element):
+    return any(ancestor.tag in NOISE_TAGS for ancestor in element.iterancestors())
+
+
+def _group_key(element):
+    """
+    Cards are grouped by their own shape and by the tags/classes of their
+    parent and grandparent, so cards split across several sections (e.g. one
+    <ul> per location) still form a single group.
+    """
+    parent = element.getparent()
+    grandparent = parent.getparent() if parent is not None else None
+    return (
+        shape_signature(element),
+        None if parent is None else (parent.tag, parent.get("class", "")),
+        None if grandparent is None else (grandparent.tag, grandparent.get("class", "")),
+    )
+
+
+def find_listing_region(page: ParsedPage):
+    """
+    Finds the most likely job-listing block: the largest group of
+    same-shaped subtrees that carry text and links.
+
+    Returns:
+        list: The repeated card elements, in document order, or [] if none.
+    """
+    groups = {}
+    for element in page.tree.iter():
+        if isinstance(element.tag, str) and element.tag not in NOISE_TAGS:
+            groups.setdefault(_group_key(element), []).append(element)
+
+    best_cards = []
+    best_score = 0.0
+    for cards in groups.values():
+        if len(cards) < MIN_REPEATS:
+            continue
+        text_length = sum(len(card.text_content().strip()) for card in cards) / len(cards)
+        # Menus and icon rows repeat too, but carry almost no text.
+        if text_length < 8:
+            continue
+        with_links = sum(1 for card in cards if card.tag == "a" or card.find(".//a") is not None)
+        score = len(cards) * min(text_length, 200) * (1 + with_links / len(cards))
+        if score > best_score and not _in_noise(cards[0]):
+            best_cards, best_score = cards, score
+    return best_cards
+
+
+def _context_heading(card):
+    """
+    Returns the text of the heading just before a card or its parent, e.g. a
+    per-location section title that the cards themselves do not repeat.
+    """
+    for element in (card, card.getparent()):
+        if element is None:
+            continue
+        sibling = element.getprevious()
+        while sibling is not None and not isinstance(sibling.tag, str):
+            sibling = sibling.getprevious()
+        if sibling is not None and _HEADING.match(sibling.tag):
+            return sibling.text_content().strip()
+    return None
+
+
+def _sample_order(count):
+    """
+    Card indices spread across the listing: first, last, then repeated halving.
+    """
+    seen = set()
+    step = count
+    while step >= 1:
+        for i in range(0, count, step):
+            if i not in seen:
+                seen.add(i)
+                yield i
+        if count - 1 not in seen:
+            seen.add(count - 1)
+            yield count - 1
+        step //= 2
+
+
+def reduce_for_llm(page: ParsedPage, token_budget: int = LLM_TOKEN_BUDGET) -> str:
+    """
+    Returns the page text to send to the LLM for structure inference, within
+    `token_budget` tokens.
+
+    Small pages are sent whole. Otherwise only a spread-out sample of cards
+    from the repeated listing block is sent, grouped under their section
+    headings. The schema learned from the sample is generalized to the job
+    card, with selectors relative to it, so it applies to every card when
+    extracting from the full page. Without a detectable listing, the page
+    text is truncated to the budget.
+    """
+    full_text = page.visible_text()
+    if estimate_tokens(full_text) <= token_budget:
+        return full_text
+
+    cards = find_listing_region(page)
+    if not cards:
+        return full_text[:token_budget * CHARS_PER_TOKEN]
+
+    picked = {}
+    used = 0
+    for i in _sample_order(len(cards)):
+        card = cards[i]
+        heading = _context_heading(card)
+        text = page.visible_text(card, link_separator=" ")
+        cost = estimate_tokens(text) + (estimate_tokens(heading) if heading else 0)
+        if used + cost > token_budget:
+            if picked:
+                break
+            text = text[:token_budget * CHARS_PER_TOKEN]
+            cost = token_budget
+        picked[i] = (heading, text)
+        used += cost
+
+    # Section headings are emitted once, before the first sampled card under them.
+    lines = []
+    last_heading = None
+    for i in sorted(picked):
+        heading, text = picked[i]
+        if heading and heading != last_heading:
+            lines.append(f"## {heading}")
+            last_heading = heading
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text: str, token_budget: int) -> str:
+    """
+    Cuts `text` to about `token_budget` tokens at a word boundary, marking
+    the cut. A budget of 0 or less means no limit.
+    """
+    limit = token_budget * CHARS_PER_TOKEN
+    if token_budget <= 0 or len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " …[truncated]"
+
+
+def _text_weights(root):
+    """
+    Visible text length and link text length of every element under `root`,
+    in one bottom-up pass (noise tags count as empty).
+    """
+    total = {}
+    linked = {}
+    for element in reversed(list(root.iter())):
+        if not isinstance(element.tag, str) or element.tag in NOISE_TAGS:
+            continue
+        text = len((element.text or "").strip())
+        links = 0
+        for child in element:
+            text += len((child.tail or "").strip())
+            if child in total:
+                text += total[child]
+                links += linked[child]
+        total[element] = text
+        linked[element] = text if element.tag == "a" else links
+    return total, linked
+
+
+def find_main_content(page: ParsedPage):
+    """
+    Returns the element holding a page's main content, e.g. a job
+    description without the site's navigation, footer and related links.
+
+    A semantic block is preferred: the largest <article>, else
+    role="main", else <main>. Otherwise the search starts at <body> and
+    descends while one child holds most of the text, link text counting
+    half (navigation is mostly links, but so is a job listing), without
+    leaving the page's <h1> behind or shrinking below MAIN_MIN_CHARS.
+    """
+    total, linked = _text_weights(page.tree)
+
+    def weight(element):
+        return total.get(element, 0) - linked.get(element, 0) / 2
+
+    for expression in ("//article", "//*[@role='main']", "//main"):
+        blocks = [block for block in page.xpath(expression) if total.get(block, 0) >= MAIN_MIN_CHARS]
+        if blocks:
+            return max(blocks, key=weight)
+
+    body = page.tree.find("body")
+    node = body if body is not None else page.tree
+    while True:
+        children = [child for child in node if child in total]
+        if not children:
+            return node
+        best = max(children, key=weight)
+        if weight(best) < MAIN_DESCEND_SHARE * weight(node) or total[best] < MAIN_MIN_CHARS:
+            return node
+        if node.find(".//h1") is not None and best.find(".//h1") is None:
+            return node
+        node = best
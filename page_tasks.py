@@ -0,0 +1,160 @@
+# The CPU-bound steps of scraping one page, run through offload.run: each
+# task takes the page source, parses it once and returns a picklable PageWork.
+# Tasks may run in another process, so they never touch the schema cache, the
+# job store or the metrics registry; the caller stores the learned schema and
+# records the returned spans.
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from extraction_plan import compile_schema
+from laststartupScraping import LastStartupScraper
+from page_reduction import estimate_tokens, find_main_content, reduce_for_llm, truncate_to_tokens
+from parsed_page import IncrementalParse, ParsedPage
+from schema_validation import score_extraction
+from structure_detector import DETECTOR_MIN_CONFIDENCE, detect_structure
+
+
+@dataclass(slots=True)
+class PageWork:
+    """
+    Result of a page task.
+
+    Attributes:
+        jobs (list): JobRecords extracted, possibly partial when `error` is set.
+        schema (dict): The schema learned for the page, if the task learns one.
+        error (str): Why extraction stopped early, if it did.
+        llm_input (str): Reduced page text to ask the LLM about, when the
+            detector found no confident schema.
+        spans (list): (stage, ms, attrs) timings for metrics.record_span.
+    """
+    jobs: list = field(default_factory=list)
+    schema: dict = None
+    error: str = None
+    llm_input: str = None
+    spans: list = field(default_factory=list)
+
+
+@contextmanager
+def _span(work, stage, **attrs):
+    start = time.perf_counter()
+    attrs["ok"] = True
+    try:
+        yield attrs
+    except BaseException:
+        attrs["ok"] = False
+        raise
+    finally:
+        work.spans.append((stage, (time.perf_counter() - start) * 1000, attrs))
+
+
+# Text handed to the feed parser at a time when a parse may stop early.
+PARSE_CHUNK_CHARS = 64 * 1024
+
+
+def _parse(work, source, url, plan=None):
+    """
+    Parses the page; with a plan that knows its listing region, only up to
+    the end of that region.
+    """
+    with _span(work, "parse", url=url) as span:
+        if plan is None or plan.region is None:
+            return ParsedPage(source, url)
+        parse = IncrementalParse(url, plan.region, plan.region_tag)
+        for start in range(0, len(source), PARSE_CHUNK_CHARS):
+            if parse.feed(source[start:start + PARSE_CHUNK_CHARS]):
+                break
+        span["stopped_early"] = parse.done
+        return parse.page()
+
+
+def iter_extract(work: PageWork, page: ParsedPage, schema: dict, version: str = None):
+    """
+    Yields the jobs of a parsed page as they are built, collecting them in
+    `work.jobs`; an exception ends the extraction but keeps the records
+    built so far. Generator tasks take the PageWork to fill and only run
+    inline or in the thread pool (see offload.iterate).
+    """
+    with _span(work, "extract", url=page.url) as span:
+        try:
+            for job in LastStartupScraper.iter_jobs_with_precise_schema(page, compile_schema(schema, version)):
+                work.jobs.append(job)
+                yield job
+        except Exception as e:
+            work.error = str(e)
+            span["ok"] = False
+        span["jobs"] = len(work.jobs)
+
+
+def iter_page(work: PageWork, source: str, url: str, schema: dict, version: str = None):
+    """
+    Parses a page and yields its jobs with a known schema, as iter_extract.
+    """
+    page = _parse(work, source, url, compile_schema(schema, version))
+    yield from iter_extract(work, page, schema, version)
+
+
+def _extract(work, page, schema, version=None):
+    for _ in iter_extract(work, page, schema, version):
+        pass
+
+
+def extract_page(source: str, url: str, schema: dict, version: str = None) -> PageWork:
+    """
+    Parses a page and extracts its jobs with a known schema.
+    """
+    work = PageWork()
+    for _ in iter_page(work, source, url, schema, version):
+        pass
+    return work
+
+
+def detect_page(source: str, url: str) -> PageWork:
+    """
+    Parses a page and runs the structural detector. A confident schema that
+    also extracts a plausible job list is returned with its jobs; otherwise
+    `llm_input` holds the token-budgeted page sample for the LLM.
+    """
+    work = PageWork()
+    page = _parse(work, source, url)
+    with _span(work, "detect", url=url) as span:
+        schema, confidence = detect_structure(page)
+        span["confidence"] = round(confidence, 3)
+    if schema is not None and confidence >= DETECTOR_MIN_CONFIDENCE:
+        _extract(work, page, schema)
+        validity = score_extraction(work.jobs)
+        span["validity"] = round(validity.score, 3)
+        if work.error is None and validity.ok:
+            work.schema = schema
+            return work
+        work.jobs, work.error = [], None
+
+    with _span(work, "reduce", url=url) as span:
+        work.llm_input = reduce_for_llm(page)
+        span["prompt_tokens_est"] = estimate_tokens(work.llm_input)
+    return work
+
+
+def learn_page(source: str, url: str, llm_jobs: list) -> PageWork:
+    """
+    Parses a page, learns selectors from the jobs the LLM found on it and
+    extracts with them. `schema` stays None if the selectors are inconsistent.
+    """
+    work = PageWork()
+    page = _parse(work, source, url)
+    with _span(work, "learn_selectors", url=url, llm_jobs=len(llm_jobs)):
+        work.schema = LastStartupScraper.consistent_selectors(page, llm_jobs)
+    if work.schema is not None:
+        _extract(work, page, work.schema)
+    return work
+
+
+def page_text(source: str, mode: str = "full", max_tokens: int = 0) -> str:
+    """
+    The page's visible text on one line (see ParsedPage.visible_text), of the
+    whole page or, with mode "main", of its main content only (see
+    find_main_content), cut to `max_tokens` (0 for no limit).
+    """
+    page = ParsedPage(source)
+    element = find_main_content(page) if mode == "main" else None
+    return truncate_to_tokens(page.visible_text(element), max_tokens)
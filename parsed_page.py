@@ -0,0 +1,250 @@
+import re
+import time
+from urllib.parse import urlparse
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Tags whose content is never visible job text.
+NOISE_TAGS = frozenset([
+    'img', 'script', 'style', 'head', 'footer', 'svg', 'iframe',
+    'noscript', 'link', 'meta', 'form', 'aside', 'nav', 'canvas',
+    'object', 'video', 'audio', 'picture', 'source'
+])
+
+# Attributes an LLM-returned value (usually a link) may be found in.
+MATCH_ATTRIBUTES = ('href', 'value', 'data-url', 'data-link')
+
+
+def _visible_strings(root, out, rewrite_links=True, link_separator=""):
+    """
+    Appends the visible text strings under `root` to `out`, in document order,
+    skipping noise tags and comments. With `rewrite_links`, an <a href> is
+    emitted as a single "text [href]" string, like the BeautifulSoup cleaner
+    did; the strings inside the link are joined with `link_separator`.
+
+    Iterative so that very deep DOMs cannot hit the recursion limit.
+    """
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        # The tail belongs to the parent, so it is emitted even if the element is skipped.
+        if item.tail and item is not root:
+            stack.append(item.tail)
+        tag = item.tag
+        if not isinstance(tag, str) or tag in NOISE_TAGS:
+            continue
+        href = item.get('href') if rewrite_links and tag == 'a' else None
+        if href is not None:
+            link_text = []
+            _visible_strings(item, link_text, rewrite_links=False)
+            out.append(f"{link_separator.join(s.strip() for s in link_text if s.strip())} [{href}]")
+            continue
+        if item.text:
+            out.append(item.text)
+        stack.extend(reversed(item))
+
+
+def css_path(element):
+    """
+    Builds a CSS selector for an lxml element, in the same format the
+    BeautifulSoup-based LastStartupScraper.get_css_selector produces.
+    """
+    path = []
+    while element is not None:
+        name = element.tag
+        classes = (element.get('class') or '').split()
+        if classes:
+            name += "." + ".".join(classes)
+        elif element.get('id'):
+            name += f"#{element.get('id')}"
+        path.insert(0, name)
+        element = element.getparent()
+    return " > ".join(path)
+
+
+def _single_string(element):
+    """
+    Equivalent of BeautifulSoup's `tag.string`: the element's only string,
+    descending through single-child wrappers, or None.
+    """
+    while True:
+        if len(element) == 0:
+            return element.text
+        if len(element) > 1 or element.text or element[0].tail:
+            return None
+        element = element[0]
+        if not isinstance(element.tag, str):
+            return element.text
+
+
+def _normalize_text(text):
+    return " ".join(text.split())
+
+
+class ParsedPage:
+    """
+    An HTML document parsed once with lxml and handed through the whole
+    pipeline: text cleaning, selector inference and XPath extraction.
+    """
+
+    def __init__(self, source, url=None, tree=None):
+        self.url = url
+        self.tree = tree if tree is not None else self._parse(source)
+        self._text_index = None
+        self._attr_index = None
+        self._path_index = None
+
+    @staticmethod
+    def _parse(source):
+        if not source or not source.strip():
+            source = "<html></html>"
+        try:
+            return lxml_html.document_fromstring(source)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration.
+            if isinstance(source, str):
+                return lxml_html.document_fromstring(source.encode("utf-8"))
+            raise
+
+    @classmethod
+    def ensure(cls, page, url=None):
+        """
+        Returns `page` unchanged if it is already parsed, otherwise parses it.
+        """
+        if isinstance(page, cls):
+            return page
+        return cls(page, url)
+
+    def visible_text(self, element=None, link_separator=""):
+        """
+        Returns the visible text of the page (or of one element in it) on a
+        single line, with noise tags removed and links inlined as "text [href]".
+        """
+        strings = []
+        _visible_strings(self.tree if element is None else element, strings, link_separator=link_separator)
+        raw_text = " ".join(s.strip() for s in strings if s.strip())
+        return re.sub(r'\s+', ' ', raw_text).strip()
+
+    def _build_indexes(self):
+        """
+        Indexes the page in one pass: normalized single-string text -> elements,
+        attribute value -> elements, and URL path of attribute values ->
+        elements. Each list holds (document position, element) pairs in
+        document order.
+        """
+        text_index = {}
+        attr_index = {}
+        path_index = {}
+        for position, element in enumerate(self.tree.iter()):
+            if not isinstance(element.tag, str):
+                continue
+            entry = (position, element)
+            string = _single_string(element)
+            if string:
+                key = _normalize_text(string)
+                if key:
+                    text_index.setdefault(key, []).append(entry)
+            for attr in MATCH_ATTRIBUTES:
+                value = element.get(attr)
+                if value is None:
+                    continue
+                value = value.strip()
+                attr_index.setdefault(value, []).append(entry)
+                path = urlparse(value).path
+                if path and path != value:
+                    path_index.setdefault(path, []).append(entry)
+        self._text_index = text_index
+        self._attr_index = attr_index
+        self._path_index = path_index
+
+    def find_text_or_attribute(self, text):
+        """
+        Returns the first element (in document order) whose only string equals
+        `text`, or whose href/value/data-url/data-link attribute contains it.
+
+        Exact text, exact attribute and URL-path matches are dict lookups; the
+        substring scan over distinct attribute values only runs when none of
+        them hit.
+        """
+        if self._text_index is None:
+            self._build_indexes()
+        text = text.strip()
+        key = _normalize_text(text)
+
+        candidates = []
+        for index, lookup in ((self._text_index, key), (self._attr_index, text), (self._path_index, text)):
+            hits = index.get(lookup)
+            if hits:
+                candidates.append(hits[0])
+        if not candidates and text:
+            for value, hits in self._attr_index.items():
+                if text in value:
+                    candidates.append(hits[0])
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: entry[0])[1]
+
+    def xpath(self, expression):
+        return self.tree.xpath(expression)
+
+
+class IncrementalParse:
+    """
+    Parses a page from text chunks as they arrive (lxml's feed parser), so
+    parsing overlaps the download and a page can be cut short.
+
+    With a `region` XPath (see ExtractionPlan.region), feed() returns True
+    once the element it matches has been closed: every job card is parsed
+    by then, and the rest of the page (often megabytes of inlined scripts)
+    is not needed.
+    """
+
+    def __init__(self, url=None, region=None, region_tag=None):
+        self.url = url
+        self.region = region
+        self.fed = 0
+        self.done = False
+        self.seconds = 0.0
+        self._region_element = None
+        events = ("start", "end") if region is not None else ()
+        self._parser = etree.HTMLPullParser(events=events, tag=region_tag)
+        # Same element classes as lxml.html, so text_content() and friends work.
+        self._parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+
+    def feed(self, text: str) -> bool:
+        """
+        Parses one more chunk. Returns True when the region has been closed.
+        """
+        if self.done:
+            return True
+        start = time.perf_counter()
+        self.fed += len(text)
+        self._parser.feed(text)
+        events = list(self._parser.read_events())
+        if self.region is not None and events:
+            # The region is looked up (once per chunk) until it has started;
+            # after that only its own end event matters.
+            if self._region_element is None:
+                found = self.region(events[0][1].getroottree())
+                self._region_element = found[0] if found else None
+            self.done = any(event == "end" and element is self._region_element for event, element in events)
+        self.seconds += time.perf_counter() - start
+        return self.done
+
+    def page(self) -> ParsedPage:
+        """
+        Finishes the parse and returns the page built from what was fed.
+        """
+        start = time.perf_counter()
+        try:
+            tree = self._parser.close()
+        except etree.XMLSyntaxError:
+            tree = None
+        self.seconds += time.perf_counter() - start
+        if tree is None or not isinstance(tree.tag, str):
+            return ParsedPage("", self.url)
+        return ParsedPage(None, self.url, tree=tree)
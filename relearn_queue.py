@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+from url_utils import site_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the same site may be re-learned again, so a page that
+# keeps failing validation does not turn into an LLM call per request.
+RELEARN_COOLDOWN = float(os.getenv("SCHEMA_RELEARN_COOLDOWN", 3600))
+
+
+class RelearnQueue:
+    """
+    Re-learns stale schemas in the background, one site at a time (a host,
+    or one company's board on an ATS host; see url_utils.site_key).
+
+    Requests never wait on it: submit() only records the URL and makes sure a
+    worker task is running on the current event loop. A site already queued
+    or re-learned within the cooldown is not queued again.
+    """
+
+    def __init__(self, relearn, cooldown=RELEARN_COOLDOWN):
+        """
+        Args:
+            relearn: Coroutine function taking a careers URL; it re-learns and
+                stores that page's schema.
+            cooldown (float): Seconds between two attempts for one site.
+        """
+        self._relearn = relearn
+        self.cooldown = cooldown
+        self._pending = OrderedDict()  # site -> url
+        self._last_attempt = {}
+        self._worker = None
+        self._loop = None
+
+    def submit(self, url: str) -> bool:
+        """
+        Queues a re-learn of `url`'s schema.
+
+        Returns:
+            bool: False if the site is already queued or in its cooldown.
+        """
+        site = site_key(url)
+        if site in self._pending:
+            metrics.incr("relearn.deduplicated")
+            return False
+        last = self._last_attempt.get(site)
+        if last is not None and time.monotonic() - last < self.cooldown:
+            metrics.incr("relearn.cooldown")
+            return False
+
+        self._pending[site] = url
+        metrics.incr("relearn.queued")
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._worker = loop.create_task(self._run())
+        return True
+
+    def pending(self) -> list:
+        return list(self._pending.values())
+
+    async def join(self):
+        """
+        Waits until the queue is drained.
+        """
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
+
+    async def _run(self):
+        while self._pending:
+            # The site stays in _pending while it runs, so it is not queued twice.
+            site, url = next(iter(self._pending.items()))
+            self._last_attempt[site] = time.monotonic()
+            try:
+                with metrics.span("relearn", url=url):
+                    await self._relearn(url)
+            except Exception as e:
+                logger.warning("Re-learning the schema for %s failed: %s", url, e)
+            finally:
+                self._pending.pop(site, None)
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_DIR = os.getenv("SCRAPER_HTTP_CACHE_DIR", ".http_cache")
+# Seconds a cached page is served without revalidation; 0 always revalidates.
+HTTP_CACHE_TTL = float(os.getenv("SCRAPER_HTTP_CACHE_TTL", 300))
+HTTP_CACHE_ENABLED = os.getenv("SCRAPER_HTTP_CACHE", "1") != "0"
+# Size and entry caps for the cache directory; past either, the least recently
+# used pages are pruned. 0 disables a cap.
+HTTP_CACHE_MAX_BYTES = int(os.getenv("SCRAPER_HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPER_HTTP_CACHE_MAX_ENTRIES", 5000))
+# Pruning frees room down to this fraction of the caps, so it does not run on every write.
+HTTP_CACHE_PRUNE_TO = 0.9
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class CachedResponse:
+    """
+    A page body plus the validators needed to revalidate it. `complete` is
+    False for a body whose download was deliberately stopped early (a prefix
+    of the page that holds everything the caller needed); `truncated` is True
+    for a body cut at the size limit, which may be missing content.
+    `final_url` is where the page was served from after redirects, the base
+    for its relative links.
+    """
+
+    def __init__(self, url, text, etag=None, last_modified=None, fetched_at=None, hash=None, from_cache=False,
+                 complete=True, truncated=False, final_url=None):
+        self.url = url
+        self.final_url = final_url or url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.hash = hash or body_hash(text)
+        self.from_cache = from_cache
+        self.complete = complete
+        self.truncated = truncated
+
+    def is_fresh(self, ttl=HTTP_CACHE_TTL):
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    On-disk cache of GET responses keyed by URL. Each entry is a small JSON
+    metadata file (validators, fetch time, body hash) next to the raw body.
+    The metadata file's mtime marks the entry's last use; once the cache
+    outgrows `max_bytes` or `max_entries`, the least recently used entries
+    are deleted.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES,
+                 max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # (entries, bytes) on disk, counted on the first write and kept up to date after it.
+        self._usage = None
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json", f"{base}.html"
+
+    def get(self, url):
+        """
+        Returns the cached response for `url`, or None.
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                text = f.read()
+        except (OSError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return CachedResponse(url, text, meta.get("etag"), meta.get("last_modified"),
+                              meta.get("fetched_at"), meta.get("hash"), from_cache=True,
+                              complete=meta.get("complete", True), final_url=meta.get("final_url"))
+
+    def put(self, response: CachedResponse):
+        meta_path, body_path = self._paths(response.url)
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            if self._usage is None:
+                self._usage = self._scan_usage()
+            existed = os.path.exists(meta_path)
+            old_size = self._entry_size(meta_path, body_path) if existed else 0
+            # Body first, metadata last: metadata without a matching body is never visible.
+            tmp_body = f"{body_path}.{os.getpid()}.tmp"
+            with open(tmp_body, "w", encoding="utf-8", errors="surrogateescape") as f:
+                f.write(response.text)
+            os.replace(tmp_body, body_path)
+            self._write_meta(meta_path, response)
+            entries, size = self._usage
+            self._usage = (entries + (not existed), size + self._entry_size(meta_path, body_path) - old_size)
+        except OSError as e:
+            logger.warning("Failed to cache %s: %s", response.url, e)
+            return
+        if self._over(*self._usage, 1.0):
+            self._prune()
+
+    def touch(self, response: CachedResponse):
+        """
+        Records a successful revalidation (304) without rewriting the body.
+        """
+        response.fetched_at = time.time()
+        meta_path, _ = self._paths(response.url)
+        try:
+            self._write_meta(meta_path, response)
+        except OSError as e:
+            logger.warning("Failed to refresh cache entry for %s: %s", response.url, e)
+
+    def _entries(self):
+        """
+        Yields (last used, metadata path, body path, size) for every entry on disk.
+        """
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                body_path = f"{meta_path[:-5]}.html"
+                try:
+                    used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                yield used, meta_path, body_path, self._entry_size(meta_path, body_path)
+
+    def _scan_usage(self):
+        entries = size = 0
+        for _, _, _, entry_size in self._entries():
+            entries += 1
+            size += entry_size
+        return entries, size
+
+    def _over(self, entries, size, fraction):
+        return ((self.max_entries and entries > self.max_entries * fraction)
+                or (self.max_bytes and size > self.max_bytes * fraction))
+
+    def _prune(self):
+        """
+        Deletes the least recently used entries until the cache is back
+        under HTTP_CACHE_PRUNE_TO of its caps.
+        """
+        found = sorted(self._entries())
+        entries, size = len(found), sum(entry[3] for entry in found)
+        removed = 0
+        for _, meta_path, body_path, entry_size in found:
+            if not self._over(entries, size, HTTP_CACHE_PRUNE_TO):
+                break
+            try:
+                # Metadata first: a body without metadata is never served.
+                os.remove(meta_path)
+                os.remove(body_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Failed to prune cache entry %s: %s", meta_path, e)
+                continue
+            entries -= 1
+            size -= entry_size
+            removed += 1
+        self._usage = (entries, size)
+        logger.info("Pruned %d HTTP cache entries (%d left, %d bytes)", removed, entries, size)
+
+    @staticmethod
+    def _entry_size(meta_path, body_path):
+        size = 0
+        for path in (meta_path, body_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    @staticmethod
+    def _write_meta(meta_path, response):
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "url": response.url,
+                "etag": response.etag,
+                "last_modified": response.last_modified,
+                "fetched_at": response.fetched_at,
+                "hash": response.hash,
+                "complete": response.complete,
+                "final_url": response.final_url,
+            }, f)
+        os.replace(tmp_meta, meta_path)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,252 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from extraction_plan import compile_schema, schema_version
+from url_utils import key_candidates, normalize_url, site_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to process-local locking only.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", "job_structure_cache.json")
+# "json" rewrites the snapshot on each flush; "journal" appends changed entries
+# to <path>l (JSON lines) and only rewrites the snapshot when compacting.
+SCHEMA_CACHE_FORMAT = os.getenv("SCHEMA_CACHE_FORMAT", "json")
+# Seconds to wait for more writes before flushing to disk.
+SCHEMA_FLUSH_DELAY = float(os.getenv("SCHEMA_FLUSH_DELAY", 2.0))
+# Journal length at which it is folded back into the snapshot.
+SCHEMA_JOURNAL_COMPACT_AT = int(os.getenv("SCHEMA_JOURNAL_COMPACT_AT", 500))
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive advisory lock on `<path>.lock` for cross-process writers.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def atomic_write_json(path, data):
+    """
+    Writes JSON to a temp file next to `path`, fsyncs it and renames it over
+    `path`, so readers never see a half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SchemaStore:
+    """
+    In-memory store of learned job-page schemas, keyed by normalized careers
+    URL (see url_utils.normalize_url; legacy raw-URL keys are normalized on
+    load). Lookups fall back from the exact page to its parent paths and then
+    to any schema learned on the same site, so one schema serves a whole site.
+    On an ATS host a site is one company's board (see url_utils.site_key),
+    so companies sharing jobs.lever.co never get each other's schemas.
+
+    The cache file is read once on first access. Writes update memory
+    immediately and are persisted after a short debounce, under a file lock,
+    either as an atomic snapshot rewrite or as appends to a journal.
+    """
+
+    def __init__(self, path=SCHEMA_CACHE_PATH, format=SCHEMA_CACHE_FORMAT,
+                 flush_delay=SCHEMA_FLUSH_DELAY, compact_at=SCHEMA_JOURNAL_COMPACT_AT):
+        self.path = path
+        self.journal_path = f"{path}l"
+        self.format = format
+        self.flush_delay = flush_delay
+        self.compact_at = compact_at
+        self._schemas = None
+        self._pending = {}
+        self._versions = {}
+        self._sites = {}
+        self._stale = set()
+        self._journal_length = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _read_disk(self):
+        schemas = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    schemas = {normalize_url(key): schema for key, schema in json.load(f).items()}
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Ignoring unreadable schema cache %s: %s", self.path, e)
+
+        journal_length = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crashed writer; everything before it is valid.
+                        continue
+                    schemas[normalize_url(entry["key"])] = entry["schema"]
+                    journal_length += 1
+        return schemas, journal_length
+
+    def _ensure_loaded(self):
+        if self._schemas is None:
+            with self._lock:
+                if self._schemas is None:
+                    schemas, self._journal_length = self._read_disk()
+                    for key in schemas:
+                        self._sites[site_key(key)] = key
+                    self._schemas = schemas
+        return self._schemas
+
+    def resolve(self, url):
+        """
+        Returns the key of the schema that applies to `url`, or None: the
+        normalized URL itself, else its closest parent path, else the site's.
+        """
+        schemas = self._ensure_loaded()
+        for key in key_candidates(url):
+            if key in schemas:
+                return key
+        return self._sites.get(site_key(url))
+
+    def __contains__(self, url):
+        return self.resolve(url) is not None
+
+    def __len__(self):
+        return len(self._ensure_loaded())
+
+    def __getitem__(self, url):
+        key = self.resolve(url)
+        if key is None:
+            raise KeyError(url)
+        return self._schemas[key]
+
+    def get(self, url, default=None):
+        key = self.resolve(url)
+        return default if key is None else self._schemas[key]
+
+    def plan(self, url):
+        """
+        Returns the compiled ExtractionPlan for the schema that applies to
+        `url`, or None.
+
+        The version stamp is computed once per stored schema, so a cache hit
+        goes straight to the plan LRU without re-hashing the selectors.
+        """
+        key = self.resolve(url)
+        if key is None:
+            return None
+        schema = self._schemas[key]
+        version = self._versions.get(key)
+        if version is None:
+            version = self._versions[key] = schema_version(schema)
+        return compile_schema(schema, version)
+
+    def mark_stale(self, url):
+        """
+        Flags the schema serving `url` as failing validation. It is still
+        served until a re-learned schema replaces it.
+        """
+        key = self.resolve(url)
+        if key is not None:
+            self._stale.add(key)
+
+    def is_stale(self, url):
+        return self.resolve(url) in self._stale
+
+    def items(self):
+        with self._lock:
+            return list(self._ensure_loaded().items())
+
+    def put(self, url, schema):
+        """
+        Stores a schema under the normalized URL and schedules it to be persisted.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            self._ensure_loaded()[key] = schema
+            self._sites[site_key(key)] = key
+            self._stale.discard(key)
+            self._versions.pop(key, None)
+            self._pending[key] = schema
+            self._schedule_flush()
+
+    def update(self, schemas):
+        with self._lock:
+            for key, schema in schemas.items():
+                self.put(key, schema)
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.flush_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """
+        Persists all pending writes. Safe to call at any time.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                with file_lock(self.path):
+                    if self.format == "journal":
+                        self._append_journal(pending)
+                    else:
+                        self._write_snapshot(pending)
+            except OSError as e:
+                logger.warning("Failed to persist schema cache: %s", e)
+                # Keep the entries so the next flush retries them.
+                self._pending = {**pending, **self._pending}
+
+    def _append_journal(self, pending):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for key, schema in pending.items():
+                f.write(json.dumps({"key": key, "schema": schema}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_length += len(pending)
+        if self._journal_length >= self.compact_at:
+            self._write_snapshot({})
+
+    def _write_snapshot(self, pending):
+        # Merge with the file as it is now, so entries written by other
+        # processes since we loaded are not lost.
+        on_disk, _ = self._read_disk()
+        on_disk.update(pending)
+        for key, schema in on_disk.items():
+            if key not in self._schemas:
+                self._schemas[key] = schema
+                self._sites.setdefault(site_key(key), key)
+        atomic_write_json(self.path, on_disk)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_length = 0
+
+
+structure_cache = SchemaStore()
@@ -0,0 +1,64 @@
+import os
+import re
+from dataclasses import dataclass, field
+
+# Extractions scoring below this are treated as a broken schema.
+SCHEMA_MIN_VALIDITY = float(os.getenv("SCHEMA_MIN_VALIDITY", 0.6))
+
+# Button and link labels that a drifted title selector tends to pick up.
+GENERIC_TITLES = {
+    "apply", "apply now", "read more", "learn more", "more", "see more", "view",
+    "view job", "view position", "details", "open", "join us", "careers",
+}
+_LETTER = re.compile(r"[^\W\d_]")
+
+
+@dataclass(slots=True)
+class Validity:
+    score: float
+    problems: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return self.score >= SCHEMA_MIN_VALIDITY
+
+
+def plausible_title(title: str) -> bool:
+    """
+    True for text that reads like a job title: a few words with letters,
+    not a button label or a URL.
+    """
+    title = title.strip()
+    if not 2 <= len(title) <= 150 or len(title.split()) > 20:
+        return False
+    if title.lower() in GENERIC_TITLES or title.startswith(("http://", "https://", "/")):
+        return False
+    return _LETTER.search(title) is not None
+
+
+def score_extraction(jobs) -> Validity:
+    """
+    Scores how much an extraction looks like a real job list, in [0, 1]:
+    the lowest of the share of records with both a title and a link
+    (aligned selectors), the share of plausible titles and the share of
+    distinct records. No records at all scores 0.
+
+    Args:
+        jobs (list[JobRecord]): The extracted records.
+    """
+    if not jobs:
+        return Validity(0.0, ["no jobs extracted"])
+
+    count = len(jobs)
+    aligned = sum(1 for job in jobs if job.title and job.link) / count
+    plausible = sum(1 for job in jobs if plausible_title(job.title)) / count
+    distinct = len({(job.title, job.link) for job in jobs}) / count
+
+    problems = []
+    if aligned < 1:
+        problems.append(f"{count - round(aligned * count)} of {count} jobs lack a title or link")
+    if plausible < 1:
+        problems.append(f"{count - round(plausible * count)} of {count} titles do not look like job titles")
+    if distinct < 1:
+        problems.append(f"{count - round(distinct * count)} of {count} jobs are duplicates")
+    return Validity(min(aligned, plausible, distinct), problems)
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+
+import http_client
+import metrics
+import offload
+import page_tasks
+from careers_discovery import careers_discovery
+from company_directory import CompanyDirectory
+from job_store import job_store
+from laststartupScraping import LastStartupScraper, extract_json_array_from_text
+from parsed_page import IncrementalParse
+from relearn_queue import RelearnQueue
+from schema_store import structure_cache
+from schema_validation import Validity, score_extraction
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://www.lastartup.co.il/funding"
+company_directory = CompanyDirectory(BASE_URL)
+
+# Upper bound on targets scraped at once by a batch, whatever the caller asks for.
+BATCH_MAX_CONCURRENCY = int(os.getenv("SCRAPER_BATCH_MAX_CONCURRENCY", 32))
+# Extracted job lists kept for reuse while a page's body and schema are unchanged.
+JOBS_CACHE_SIZE = int(os.getenv("SCRAPER_JOBS_CACHE_SIZE", 512))
+
+# url -> (body hash, schema version, jobs)
+_jobs_cache = OrderedDict()
+
+
+def _cached_jobs(url, body_hash, version):
+    entry = _jobs_cache.get(url)
+    if entry is None or entry[0] != body_hash or entry[1] != version:
+        return None
+    _jobs_cache.move_to_end(url)
+    return entry[2]
+
+
+def _remember_jobs(url, body_hash, version, jobs):
+    _jobs_cache[url] = (body_hash, version, jobs)
+    _jobs_cache.move_to_end(url)
+    if len(_jobs_cache) > JOBS_CACHE_SIZE:
+        _jobs_cache.popitem(last=False)
+
+
+class ScrapeError(Exception):
+    """
+    A pipeline step failed; the message is meant for the agent.
+    """
+
+
+async def resolve_company(company: str) -> str:
+    """
+    Resolves a company name to its careers URL: the directory gives the
+    company's site, careers discovery finds the actual careers page on it.
+
+    Raises:
+        ScrapeError: If the directory cannot be loaded or has no match.
+    """
+    try:
+        with metrics.span("resolve_company", company=company):
+            match = await company_directory.find(company)
+    except Exception as e:
+        raise ScrapeError(f"Failed to load companies: {str(e)}")
+    if not match:
+        raise ScrapeError(f"Company '{company}' not found.")
+    try:
+        return await careers_discovery.resolve(match["careers_url"])
+    except Exception as e:
+        logger.warning("Careers discovery failed for %s: %s", company, e)
+        return match["careers_url"]
+
+
+async def run_page_task(task, source, *args, size: int = None) -> page_tasks.PageWork:
+    """
+    Runs a page_tasks function through the offload pool (inline for small
+    pages) and records the spans it measured.
+
+    Args:
+        size (int): Page length deciding inline vs offload; defaults to len(source).
+    """
+    work = await offload.run(task, source, *args, size=len(source) if size is None else size)
+    for stage, ms, attrs in work.spans:
+        metrics.record_span(stage, ms, **attrs)
+    return work
+
+
+async def iter_page_task(work: page_tasks.PageWork, task, source, *args, size: int = None):
+    """
+    Runs a page_tasks generator (see offload.iterate) and yields each job as
+    it is built; `work` collects the jobs, error and spans, which are
+    recorded once the task finishes.
+
+    Args:
+        size (int): Page length deciding inline vs offload; defaults to len(source).
+    """
+    async for job in offload.iterate(task, work, source, *args, size=len(source) if size is None else size):
+        yield job
+    for stage, ms, attrs in work.spans:
+        metrics.record_span(stage, ms, **attrs)
+
+
+async def learn_structure(source: str, url: str) -> page_tasks.PageWork:
+    """
+    Derives (and caches) a schema for a page and extracts its jobs with it.
+    The structural detector is tried first; only when it is not confident is
+    the LLM asked for the jobs on a token-budgeted sample of the page.
+
+    Returns:
+        PageWork: `schema` is None if no consistent schema was found.
+    """
+    work = await run_page_task(page_tasks.detect_page, source, url)
+    if work.schema is not None:
+        metrics.incr("detector.hit")
+        LastStartupScraper.update_schema_cache(url, work.schema)
+        return work
+    metrics.incr("detector.miss")
+
+    llm_content = extract_json_array_from_text(await LastStartupScraper.ask_llm_for_content_async(work.llm_input, url))
+    work = await run_page_task(page_tasks.learn_page, source, url, llm_content)
+    if work.schema is not None:
+        LastStartupScraper.update_schema_cache(url, work.schema)
+    return work
+
+
+async def relearn(url: str):
+    """
+    Re-fetches a page and learns its schema again, replacing the stale one.
+    Runs in the background relearn queue, never on a request path.
+    """
+    response = await http_client.fetch_cached(url)
+    work = await learn_structure(response.text, url)
+    if work.schema is None:
+        return
+    validity = score_extraction(work.jobs)
+    metrics.observe("schema.relearn_validity", validity.score)
+    if not validity.ok:
+        structure_cache.mark_stale(url)
+
+
+relearn_queue = RelearnQueue(relearn)
+
+
+def _schema_failed(url, validity: Validity, from_cache: bool, report):
+    """
+    Handles an extraction that failed validation: a cached schema is marked
+    stale and queued for background re-learning. The caller still serves
+    whatever was extracted.
+    """
+    metrics.incr("schema.invalid")
+    queued = False
+    if from_cache:
+        structure_cache.mark_stale(url)
+        queued = relearn_queue.submit(url) or url in relearn_queue.pending()
+    if report is not None:
+        report.update(degraded=True, problems=validity.problems, relearning=queued)
+
+
+async def stream_jobs(url: str, report: dict = None, company: str = None):
+    """
+    Runs the full pipeline for one careers page: fetch, look up or learn the
+    schema, then parse and extract. Parsing, structure learning and
+    extraction run through the offload pool for large pages, so they never
+    stall other tool calls. With a cached schema, records are yielded as
+    soon as each one is built, except in process mode, where they are
+    yielded once the worker has extracted the page.
+
+    Every extraction is scored (see schema_validation). One that fails marks
+    a cached schema stale and queues it for background re-learning; the
+    records found are still served, as a degraded result. A valid extraction
+    of the whole page is recorded in the job store, which keeps the search
+    index current; a page cut at the download limit is served as degraded.
+
+    Args:
+        url (str): The careers page.
+        report (dict): Optional; filled with "validity" and "degraded", plus
+            "problems" and "relearning" for a degraded result and "changes"
+            (new/removed/changed counts) once recorded in the job store.
+        company (str): The company name, if known, for the job store.
+
+    Yields:
+        JobRecord: One per job on the page.
+
+    Raises:
+        ScrapeError: With a message describing the failed step.
+    """
+    structure = structure_cache.plan(url)
+    # With a cached schema, a downloaded page is parsed while it arrives and
+    # the download stops once its listing region is closed. A process pool
+    # parses in the worker instead, keeping parsing off the event loop.
+    stream = None
+    if structure is not None and structure.container is not None and offload.OFFLOAD_MODE != "process":
+        stream = IncrementalParse(url, structure.region, structure.region_tag)
+    try:
+        with metrics.span("fetch", url=url) as span:
+            response = await http_client.fetch_cached(url, on_text=stream.feed if stream is not None else None)
+            span["from_cache"] = response.from_cache
+            span["bytes"] = len(response.text)
+            span["complete"] = response.complete
+    except Exception as e:
+        raise ScrapeError(f"Failed to fetch {url}: {str(e)}")
+
+    if report is not None:
+        report["degraded"] = False
+    # A stale schema bypasses the jobs cache, so every scrape is validated
+    # (and reported as degraded) until a re-learned schema replaces it.
+    stale = structure is not None and structure_cache.is_stale(url)
+    if structure is not None:
+        metrics.incr("schema_cache.hit")
+        jobs = None if stale else _cached_jobs(url, response.hash, structure.version)
+        if jobs is not None:
+            metrics.incr("jobs_cache.hit")
+            for job in jobs:
+                yield job
+            return
+    else:
+        metrics.incr("schema_cache.miss")
+
+    from_cache = structure is not None
+    streamed = from_cache and offload.OFFLOAD_MODE != "process"
+    work = page_tasks.PageWork()
+    try:
+        if streamed and stream is not None and stream.fed:
+            page = stream.page()
+            metrics.record_span("parse", stream.seconds * 1000, url=url, streamed=True, stopped_early=stream.done)
+            async for job in iter_page_task(work, page_tasks.iter_extract, page, structure.schema, structure.version,
+                                            size=stream.fed):
+                yield job
+        elif streamed:
+            async for job in iter_page_task(work, page_tasks.iter_page, response.text, url, structure.schema,
+                                            structure.version):
+                yield job
+        elif from_cache:
+            work = await run_page_task(page_tasks.extract_page, response.text, url, structure.schema, structure.version)
+        else:
+            work = await learn_structure(response.text, url)
+    except Exception as e:
+        step = "parse jobs" if from_cache else "infer structure"
+        raise ScrapeError(f"Failed to {step} for {url}: {str(e)}")
+    if work.schema is None and not from_cache:
+        raise ScrapeError(f"Failed to infer structure for {url}: no consistent selectors for the jobs found")
+
+    jobs = work.jobs
+    if not streamed:
+        for job in jobs:
+            yield job
+    if work.error is not None:
+        _schema_failed(url, Validity(0.0, [f"extraction failed: {work.error}"]), from_cache, report)
+        if not jobs:
+            raise ScrapeError(f"Error parsing jobs: {work.error}")
+        return
+
+    validity = score_extraction(jobs)
+    metrics.observe("schema.validity", validity.score)
+    if report is not None:
+        report["validity"] = round(validity.score, 3)
+    if not validity.ok:
+        _schema_failed(url, validity, from_cache, report)
+        return
+    if response.truncated:
+        # Jobs past the cut would be recorded as removed.
+        if report is not None:
+            report.update(degraded=True, problems=["the page is larger than the download limit"])
+        return
+    if from_cache and not stale:
+        _remember_jobs(url, response.hash, structure.version, jobs)
+
+    try:
+        with metrics.span("record", url=url) as span:
+            changes = await asyncio.to_thread(job_store.record_scrape, url, jobs, company,
+                                              base_url=response.final_url)
+            span.update(changes)
+    except sqlite3.Error as e:
+        logger.warning("Failed to record jobs for %s: %s", url, e)
+        return
+    if report is not None:
+        report["changes"] = changes
+
+
+async def scrape_jobs(url: str, report: dict = None, company: str = None) -> list:
+    """
+    Collects stream_jobs() into a list of JobRecords.
+    """
+    return [job async for job in stream_jobs(url, report, company)]
+
+
+async def scrape_target(target: str) -> tuple:
+    """
+    Scrapes a company name or a careers URL (anything starting with http).
+
+    Returns:
+        tuple: (careers_url, jobs)
+    """
+    if target.startswith(("http://", "https://")):
+        return target, await scrape_jobs(target)
+    url = await resolve_company(target)
+    return url, await scrape_jobs(url, company=target)
+
+
+async def scrape_many(targets: list, max_concurrency: int = 8):
+    """
+    Scrapes many targets concurrently and yields results as they complete.
+
+    At most `max_concurrency` targets are in flight; per-host politeness is
+    enforced by the shared HTTP client. A failing target never affects the others.
+
+    Yields:
+        tuple: (index, target, careers_url or None, jobs or None, error or None)
+    """
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def run(index, target):
+        async with semaphore:
+            try:
+                url, jobs = await scrape_target(target)
+                return index, target, url, jobs, None
+            except ScrapeError as e:
+                return index, target, None, None, str(e)
+            except Exception as e:
+                return index, target, None, None, f"Unexpected error: {str(e)}"
+
+    tasks = [asyncio.create_task(run(i, target)) for i, target in enumerate(targets)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,301 @@
+import json
+import os
+import re
+from collections import Counter
+
+from extraction_plan import generalize_schema
+from page_reduction import find_listing_region
+from parsed_page import ParsedPage, css_path
+
+# Below this confidence the detector's schema is ignored and the LLM is asked.
+DETECTOR_MIN_CONFIDENCE = float(os.getenv("STRUCTURE_DETECTOR_MIN_CONFIDENCE", 0.6))
+
+# Schema marker for pages whose jobs come from JSON-LD JobPosting blocks.
+JSON_LD_SOURCE = "json-ld"
+
+_JOB_LINK = re.compile(r"job|career|position|opening|vacanc|apply|greenhouse|lever\.co|comeet|workable|ashby", re.I)
+_TITLE_HINT = re.compile(r"title|name|position|role", re.I)
+_LOCATION_HINT = re.compile(r"location|city|place|office", re.I)
+_HEADING = re.compile(r"^h[1-6]$")
+# Section headings naming a team rather than an office.
+_DEPARTMENT_WORDS = re.compile(
+    r"engineering|r&d|research|develop|product|design|marketing|sales|finance|operations|"
+    r"support|success|legal|people|hr\b|human|data|security|it\b|admin|business", re.I
+)
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Known applicant-tracking-system markup: card, then title/link/location relative to it.
+ATS_PATTERNS = {
+    "greenhouse": {
+        "card": f"//div[{_has_class('opening')}]",
+        "title": "./a",
+        "link": "./a[@href]",
+        "location": f"./span[{_has_class('location')}]",
+    },
+    "lever": {
+        "card": f"//div[{_has_class('posting')}]",
+        "title": ".//*[@data-qa='posting-name']",
+        "link": f".//a[{_has_class('posting-title')}]",
+        "location": f".//span[{_has_class('sort-by-location')}]",
+    },
+    "comeet": {
+        "card": f"//a[{_has_class('positionItem')}]",
+        "title": f".//*[{_has_class('positionLink')}]",
+        "link": "self::a[@href]",
+        "location": f".//ul[{_has_class('positionDetails')}]/li[1]",
+    },
+}
+
+
+def _iter_json_ld(page: ParsedPage):
+    for script in page.tree.iterfind(".//script[@type='application/ld+json']"):
+        try:
+            data = json.loads(script.text or "")
+        except json.JSONDecodeError:
+            continue
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, dict):
+                if "@graph" in item:
+                    stack.append(item["@graph"])
+                kind = item.get("@type")
+                if kind == "JobPosting" or (isinstance(kind, list) and "JobPosting" in kind):
+                    yield item
+
+
+def _json_ld_location(posting):
+    locations = posting.get("jobLocation") or []
+    if isinstance(locations, dict):
+        locations = [locations]
+    names = []
+    for location in locations:
+        address = location.get("address", {}) if isinstance(location, dict) else {}
+        if isinstance(address, str):
+            names.append(address)
+        elif isinstance(address, dict):
+            name = address.get("addressLocality") or address.get("addressRegion") or address.get("addressCountry")
+            if isinstance(name, dict):
+                name = name.get("name")
+            if name:
+                names.append(name)
+    if not names and posting.get("jobLocationType") == "TELECOMMUTE":
+        names.append("Remote")
+    return ", ".join(names)
+
+
+def iter_json_ld_jobs(page: ParsedPage):
+    """
+    Yields job dicts (title, link, location, department) from the page's
+    JSON-LD JobPosting blocks.
+    """
+    for posting in _iter_json_ld(page):
+        department = posting.get("occupationalCategory") or ""
+        if isinstance(department, list):
+            department = ", ".join(map(str, department))
+        yield {
+            "title": str(posting.get("title") or "").strip(),
+            "link": posting.get("url") or "",
+            "location": _json_ld_location(posting),
+            "department": str(department),
+        }
+
+
+def _consistent_path(elements):
+    """
+    Returns the most common absolute selector of `elements` and the share of
+    elements that have it.
+    """
+    paths = Counter(css_path(element) for element in elements if element is not None)
+    if not paths:
+        return None, 0.0
+    path, count = paths.most_common(1)[0]
+    return path, count / len(elements)
+
+
+def _schema_from_cards(cards, title_of, link_of, location_of):
+    """
+    Builds a schema from per-card field finders. Confidence is the share of
+    cards whose title and link resolve to the schema's selectors.
+    """
+    titles = [title_of(card) for card in cards]
+    links = [link_of(card) for card in cards]
+    title_path, title_share = _consistent_path(titles)
+    link_path, link_share = _consistent_path(links)
+    if not title_path or not link_path:
+        return None, 0.0
+
+    schema = {"title": title_path, "link": link_path}
+    locations = [location_of(card) for card in cards]
+    location_path, location_share = _consistent_path(locations)
+    if location_path and location_share >= 0.8:
+        schema["location"] = location_path
+    return schema, min(title_share, link_share)
+
+
+def _first(element, xpath):
+    found = element.xpath(xpath)
+    return found[0] if found else None
+
+
+def _detect_ats(page: ParsedPage):
+    best = (None, 0.0)
+    for pattern in ATS_PATTERNS.values():
+        cards = page.tree.xpath(pattern["card"])
+        if not cards:
+            continue
+        schema, confidence = _schema_from_cards(
+            cards,
+            lambda card: _first(card, pattern["title"]),
+            lambda card: _first(card, pattern["link"]),
+            lambda card: _first(card, pattern["location"]),
+        )
+        if confidence > best[1]:
+            best = (schema, confidence)
+    return best
+
+
+def _card_link(card):
+    if card.tag == "a" and card.get("href"):
+        return card
+    return _first(card, ".//a[@href]")
+
+
+def _card_title(card):
+    """
+    The card's heading, else an element whose class hints at a title, else
+    the deepest text-bearing element of the card's link.
+    """
+    heading = next((el for el in card.iter() if isinstance(el.tag, str) and _HEADING.match(el.tag)), None)
+    if heading is not None:
+        return heading
+    for element in card.iter():
+        if isinstance(element.tag, str) and _TITLE_HINT.search(element.get("class", "")) and element.text_content().strip():
+            return element
+    link = _card_link(card)
+    if link is None:
+        return None
+    texts = [el for el in link.iter() if isinstance(el.tag, str) and el.text and el.text.strip()]
+    return texts[0] if texts else link
+
+
+def _card_location(card):
+    for element in card.iter():
+        if isinstance(element.tag, str) and _LOCATION_HINT.search(element.get("class", "")) and element.text_content().strip():
+            return element
+    return None
+
+
+def _repeated_short_field(cards, schema):
+    """
+    Finds a location-like field when no class names one: a short text element
+    present in (almost) every card whose values repeat across cards, the way
+    a handful of offices repeat across many postings.
+    """
+    values = {}
+    for card in cards:
+        for element in card.iter():
+            if not isinstance(element.tag, str) or len(element):
+                continue
+            text = element.text_content().strip()
+            if text and len(text) <= 40:
+                values.setdefault(css_path(element), []).append(text)
+
+    taken = set(schema.values())
+    best = None
+    for path, texts in values.items():
+        if path in taken or len(texts) < 0.8 * len(cards):
+            continue
+        distinct = len(set(texts)) / len(texts)
+        if distinct <= 0.5 and (best is None or distinct < best[1]):
+            best = (path, distinct)
+    return best[0] if best else None
+
+
+def _section_heading(card, max_levels=3):
+    """
+    The heading that opens the section a card is in: the closest preceding
+    sibling heading of the card or of one of its nearest ancestors.
+    """
+    element = card
+    for _ in range(max_levels):
+        for sibling in element.itersiblings(preceding=True):
+            if isinstance(sibling.tag, str) and _HEADING.match(sibling.tag):
+                return sibling
+        element = element.getparent()
+        if element is None:
+            break
+    return None
+
+
+def _section_field(cards):
+    """
+    Finds a field given per section rather than per card, as in listings
+    grouped under one heading per office ("Tel Aviv", then its jobs). The
+    headings must share a selector, be short and split the cards into at
+    least two groups.
+
+    Returns:
+        tuple: ("location" or "department", selector), or (None, None).
+    """
+    headings = [_section_heading(card) for card in cards]
+    path, share = _consistent_path(headings)
+    sections = {heading for heading in headings if heading is not None}
+    if not path or share < 0.8 or len(sections) < 2:
+        return None, None
+    texts = [heading.text_content().strip() for heading in sections]
+    if any(len(text) > 40 for text in texts):
+        return None, None
+    teams = sum(1 for text in texts if _DEPARTMENT_WORDS.search(text))
+    return ("department" if teams > len(texts) / 2 else "location"), path
+
+
+def _detect_repeated_cards(page: ParsedPage):
+    cards = find_listing_region(page)
+    if not cards:
+        return None, 0.0
+    schema, agreement = _schema_from_cards(cards, _card_title, _card_link, _card_location)
+    if schema is None:
+        return None, 0.0
+    if "location" not in schema:
+        location = _repeated_short_field(cards, schema)
+        if location:
+            schema["location"] = location
+    if "location" not in schema or "department" not in schema:
+        field, heading = _section_field(cards)
+        if field and field not in schema:
+            schema[field] = heading
+    hrefs = [link.get("href", "") for link in map(_card_link, cards) if link is not None]
+    job_links = sum(1 for href in hrefs if _JOB_LINK.search(href)) / len(cards)
+    distinct = len(set(hrefs)) / len(cards)
+    # Repeated blocks are only jobs if their links look like postings and lead to different pages.
+    return schema, agreement * distinct * (0.5 + 0.5 * job_links)
+
+
+def detect_structure(page: ParsedPage):
+    """
+    Infers a job-page schema without the LLM, from JSON-LD JobPosting data,
+    known ATS markup (Greenhouse, Lever, Comeet) or repeated card structures.
+
+    Returns:
+        tuple: (schema or None, confidence in [0, 1]). The schema is in the
+        generalized, container-relative format extract_jobs_with_precise_schema
+        consumes.
+    """
+    if next(_iter_json_ld(page), None) is not None:
+        return {"source": JSON_LD_SOURCE}, 1.0
+
+    schema, confidence = _detect_ats(page)
+    if confidence < DETECTOR_MIN_CONFIDENCE:
+        generic, generic_confidence = _detect_repeated_cards(page)
+        if generic_confidence > confidence:
+            schema, confidence = generic, generic_confidence
+    if schema is None:
+        return None, 0.0
+    return generalize_schema(schema, page.tree), confidence
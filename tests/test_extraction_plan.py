@@ -0,0 +1,95 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import page_tasks  # noqa: E402
+from extraction_plan import ExtractionPlan  # noqa: E402
+from laststartupScraping import LastStartupScraper  # noqa: E402
+from parsed_page import ParsedPage  # noqa: E402
+from schema_validation import score_extraction  # noqa: E402
+
+
+def card_page(jobs):
+    cards = "".join(
+        f'<div class="job"><a href="/j/{i}"><h3 class="title">{title}</h3></a><span class="loc">{location}</span></div>'
+        for i, (title, location) in enumerate(jobs)
+    )
+    return f'<html><body><main><div class="jobs">{cards}</div></main></body></html>'
+
+
+def office_page(offices):
+    sections = "".join(
+        f'<section class="office"><h2 class="city">{city}</h2><ul>'
+        + "".join(f'<li><a href="/j/{city}/{i}">{title}</a><span class="type">Full-time</span></li>' for i, title in enumerate(titles))
+        + "</ul></section>"
+        for city, titles in offices.items()
+    )
+    return f'<html><body><main>{sections}</main></body></html>'
+
+
+def learn(html, jobs):
+    return LastStartupScraper.consistent_selectors(ParsedPage(html), jobs)
+
+
+def extract(html, schema):
+    return list(LastStartupScraper.iter_jobs_with_precise_schema(ParsedPage(html), schema))
+
+
+def test_schema_learned_from_one_card_extracts_every_later_card():
+    schema = learn(card_page([("Backend Engineer", "Tel Aviv")]),
+                   [{"title": "Backend Engineer", "link": "/j/0", "location": "Tel Aviv"}])
+    assert schema is not None and schema.get("job_container") != "html"
+
+    later = [(f"Engineer {i}", f"City {i}") for i in range(5)]
+    jobs = extract(card_page(later), schema)
+    assert [(job.title, job.location) for job in jobs] == later
+
+
+def test_schema_learned_from_one_job_per_section_keeps_added_jobs():
+    schema = learn(office_page({"Tel Aviv": ["Backend Engineer"], "London": ["Designer"]}), [
+        {"title": "Backend Engineer", "link": "/j/Tel Aviv/0", "location": "Tel Aviv"},
+        {"title": "Designer", "link": "/j/London/0", "location": "London"},
+    ])
+    assert schema is not None
+    assert "section" not in schema["job_container"].rsplit(" > ", 1)[-1]
+
+    jobs = extract(office_page({"Tel Aviv": ["Backend Engineer", "Data Engineer"], "London": ["Designer"]}), schema)
+    assert [(job.title, job.location) for job in jobs] == [
+        ("Backend Engineer", "Tel Aviv"), ("Data Engineer", "Tel Aviv"), ("Designer", "London"),
+    ]
+    assert score_extraction(jobs).ok
+
+
+def listing_page(lists, wrapper_id=None):
+    # Filler between the blocks, so the second one arrives in a later chunk.
+    blocks = f"<p>{'x' * 100_000}</p>".join(
+        '<div class="list"><ul>'
+        + "".join(f'<li><a href="/j/{title}">{title}</a><span class="loc">{title} Office</span></li>' for title in titles)
+        + "</ul></div>"
+        for titles in lists
+    )
+    wrapper = f'<div id="{wrapper_id}">{blocks}</div>' if wrapper_id else f"<div>{blocks}</div>"
+    return f"<html><body><main>{wrapper}</main><script>{'x' * 200_000}</script></body></html>"
+
+
+def test_streamed_parse_keeps_jobs_after_a_repeated_listing_block():
+    learned = [["Backend Engineer", "Designer"]]
+    later = [["Backend Engineer", "Designer", "Data Engineer"], ["Sales Manager", "Recruiter"]]
+    for wrapper_id in (None, "careers"):
+        schema = learn(listing_page(learned, wrapper_id), [
+            {"title": title, "link": f"/j/{title}", "location": f"{title} Office"} for title in learned[0]
+        ])
+        assert schema is not None
+        work = page_tasks.extract_page(listing_page(later, wrapper_id), "https://acme.com/careers", schema)
+        assert [job.title for job in work.jobs] == [title for titles in later for title in titles]
+
+
+def test_region_saved_without_an_id_is_not_used_to_stop_parsing():
+    plan = ExtractionPlan({
+        "job_container": "html > body > main > div > div.list > ul > li > a",
+        "job_region": "html > body > main > div > div.list",
+        "title": ".",
+        "link": ".",
+    })
+    assert plan.region is None
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore  # noqa: E402
+from laststartupScraping import JobRecord  # noqa: E402
+
+UNCHANGED = {"new": 0, "removed": 0, "changed": 0}
+
+
+def test_host_spelling_does_not_churn_postings(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    jobs = [JobRecord("Backend", "/j/1"), JobRecord("Frontend", "/j/2"), JobRecord("Design", "/j/3")]
+    store.record_scrape("https://www.acme.com/careers/", jobs)
+    assert store.record_scrape("https://acme.com/careers", jobs) == UNCHANGED
+
+
+def test_relative_links_resolve_against_final_url(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    jobs = [JobRecord("Backend", "backend-engineer")]
+    store.record_scrape("https://acme.com/careers/", jobs)
+    changes = store.record_scrape("https://acme.com/careers", jobs, base_url="https://acme.com/careers/")
+    assert changes == UNCHANGED
+
+
+def test_linkless_postings_keep_duplicates(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    jobs = [JobRecord("Sales", location="Tel Aviv"), JobRecord("Sales", location="New York"),
+            JobRecord("Sales", location="New York")]
+    assert store.record_scrape("https://acme.com/careers", jobs)["new"] == 3
+    assert store.record_scrape("https://acme.com/careers", jobs[::-1]) == UNCHANGED
+
+
+def test_old_keys_are_migrated(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    JobStore(path).record_scrape("https://acme.com/careers", [JobRecord("Backend", "/j/1")])
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE postings SET link = 'https://www.acme.com/j/1'")
+        conn.execute("INSERT INTO postings (careers_url, link, title, location, department, first_seen, last_seen)"
+                     " SELECT careers_url, 'https://acme.com/careers#sales', 'Sales', 'Remote', '', first_seen, last_seen"
+                     " FROM postings")
+    conn.close()
+    jobs = [JobRecord("Backend", "/j/1"), JobRecord("Sales", location="Remote")]
+    assert JobStore(path).record_scrape("https://acme.com/careers", jobs) == UNCHANGED
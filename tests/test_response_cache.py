@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import CachedResponse, ResponseCache  # noqa: E402
+
+
+def put_pages(cache, urls):
+    for at, url in enumerate(urls):
+        cache.put(CachedResponse(url, "x" * 100))
+        meta_path, _ = cache._paths(url)
+        os.utime(meta_path, (at, at))
+
+
+def test_entry_cap_prunes_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=0, max_entries=10)
+    put_pages(cache, [f"https://acme.com/{i}" for i in range(10)])
+    cache.get("https://acme.com/0")
+    cache.put(CachedResponse("https://acme.com/new", "y"))
+    assert cache.get("https://acme.com/0") is not None
+    assert cache.get("https://acme.com/new") is not None
+    assert cache.get("https://acme.com/1") is None
+    assert cache._scan_usage()[0] == 9
+
+
+def test_size_cap_counts_existing_entries(tmp_path):
+    put_pages(ResponseCache(str(tmp_path), max_bytes=0, max_entries=0), [f"https://acme.com/{i}" for i in range(5)])
+    cache = ResponseCache(str(tmp_path), max_bytes=1000, max_entries=0)
+    cache.put(CachedResponse("https://acme.com/big", "z" * 400))
+    assert cache.get("https://acme.com/big") is not None
+    assert cache._scan_usage()[1] <= 900
@@ -0,0 +1,135 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# A leading path segment naming a locale: /en, /he, /en-us, /pt_BR. Only
+# known language codes, so paths like /hr/careers or /id/jobs are kept.
+_LOCALE_SEGMENT = re.compile(
+    r"^(?:en|he|iw|ar|fr|de|es|it|pt|ru|ja|zh|ko|nl|sv|da|no|nb|fi|pl|cs|tr|uk|el|hu|ro|th|vi)"
+    r"(?:[-_][a-z]{2})?$", re.I)
+# Query parameters that only track where a click came from.
+_TRACKING_PARAM = re.compile(r"^(?:utm_\w+|gh_src|source|src|ref|referrer|fbclid|gclid|lever-source.*)$", re.I)
+
+# Applicant tracking systems: one host serves the boards of many companies.
+ATS_HOSTS = (
+    "greenhouse.io", "lever.co", "comeet.com", "comeet.co", "workable.com", "ashbyhq.com",
+    "bamboohr.com", "smartrecruiters.com", "breezy.hr", "recruitee.com", "teamtailor.com", "personio.de",
+)
+# Query parameters naming the company on an ATS board, e.g. Greenhouse's
+# boards.greenhouse.io/embed/job_board?for=acme.
+_ATS_BOARD_PARAMS = ("for", "company", "board")
+# Subdomains an ATS shares between companies; on any other subdomain
+# (acme.bamboohr.com) the host itself names the company.
+_ATS_SHARED_SUBDOMAINS = ("www", "jobs", "boards", "job-boards", "apply", "careers")
+# Leading path segments that come before the company name, as in
+# www.comeet.com/jobs/acme/...
+_ATS_GENERIC_SEGMENTS = ("jobs", "careers", "embed", "job_board")
+
+
+def is_ats_host(host: str) -> bool:
+    host = host.lower()
+    return any(host == ats or host.endswith(f".{ats}") for ats in ATS_HOSTS)
+
+
+def is_ats_url(url: str) -> bool:
+    return is_ats_host(urlsplit(url if "://" in url else f"http://{url}").hostname or "")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Returns the canonical key of a careers URL: lowercase host without
+    "www." and port, then the path without locale prefix, trailing slash,
+    query or fragment. The scheme is dropped. On an ATS host the path is
+    kept as is, and a query parameter naming the company's board is kept.
+
+        https://www.WSC-Sports.com/en/careers/#open -> wsc-sports.com/careers
+        https://boards.greenhouse.io/embed/job_board?for=acme&b=x -> boards.greenhouse.io/embed/job_board?for=acme
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    segments = [segment for segment in parts.path.split("/") if segment]
+    if is_ats_host(host):
+        key = "/".join([host, *segments])
+        board = _board_param(parts.query)
+        return f"{key}?{board}" if board else key
+    if segments and _LOCALE_SEGMENT.match(segments[0]):
+        segments = segments[1:]
+    return "/".join([host, *segments])
+
+
+def _board_param(query):
+    for name, value in parse_qsl(query):
+        if name.lower() in _ATS_BOARD_PARAMS and value:
+            return urlencode([(name.lower(), value)])
+    return None
+
+
+def url_host(key: str) -> str:
+    """
+    The host part of a normalized key.
+    """
+    return key.split("/", 1)[0].split("?", 1)[0]
+
+
+def site_key(url: str) -> str:
+    """
+    The normalized key of the site a URL belongs to: its host, or on a host
+    an ATS shares between companies the company's board (the path up to the
+    company name, or the board query parameter).
+
+        https://jobs.lever.co/acme/1234 -> jobs.lever.co/acme
+        https://www.comeet.com/jobs/acme/12.345 -> comeet.com/jobs/acme
+    """
+    key = normalize_url(url)
+    host = url_host(key)
+    if not is_ats_host(host) or not _is_shared_ats_host(host):
+        return host
+    if "?" in key:
+        return key
+    board = [host]
+    for segment in key.split("/")[1:]:
+        board.append(segment)
+        if segment.lower() not in _ATS_GENERIC_SEGMENTS:
+            break
+    return "/".join(board)
+
+
+def _is_shared_ats_host(host):
+    return any(host == ats for ats in ATS_HOSTS) or host.split(".", 1)[0] in _ATS_SHARED_SUBDOMAINS
+
+
+def key_candidates(url: str):
+    """
+    Yields the lookup keys for a URL, most specific first: the normalized
+    URL, then each parent path, ending with the bare host. On an ATS host
+    they end with the company's board (see site_key), never the shared host.
+    """
+    key = normalize_url(url)
+    last = site_key(url)
+    while True:
+        yield key
+        if key == last or "/" not in key:
+            return
+        key = key.rsplit("/", 1)[0]
+
+
+def canonical_link(base_url: str, link: str) -> str:
+    """
+    Returns the absolute, canonical form of a job link found on `base_url`:
+    lowercase scheme and host without "www.", no fragment, no tracking
+    parameters, no trailing slash. Two scrapes of the same posting give the
+    same string.
+    """
+    parts = urlsplit(urljoin(base_url, link.strip()))
+    netloc = parts.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not _TRACKING_PARAM.match(key)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ""))